@@ -1,269 +1,249 @@
 """
 Search Route - Find matches using ML model (FIXED VERSION)
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, aliased
 from app.core.database import get_db
-from app.models.database_models import Item, Match, ItemType
-from app.services.ml_service import ml_service
-from app.services.feature_extractor import feature_extractor
-from app.services.image_processor import load_clean_image
-from typing import List, Dict
-import numpy as np
-import os
+from app.models.database_models import Item, Match
+from app.services.matching_service import SearchCancelled, search_by_token
+from app.services.match_queue import match_queue
+from app.services.inference_executor import inference_executor
+from typing import Dict, Optional
+import asyncio
+import json
+import logging
+import threading
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
+
+# Registered before /search/{tracking_token}, which would otherwise capture this path
+@router.get("/search/recent-matches")
+async def get_recent_matches(
+    limit: int = 10,
+    cursor: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get recent successful matches, newest first
+    
+    One joined query (lost and found items as aliases of Item), paged by
+    keyset on Match.id: pass the returned next_cursor to get the following
+    page. Ids are monotonic, so they order matches by insertion without
+    comparing timestamps (SQLite stores them at a different precision than
+    the bound cursor value, which made pages repeat).
+    
+    Args:
+        limit: Page size (1-100)
+        cursor: next_cursor from the previous page
+    """
+    limit = max(1, min(limit, 100))
+    lost_item = aliased(Item, name="lost_item")
+    found_item = aliased(Item, name="found_item")
+    
+    query = db.query(
+        Match.id,
+        Match.confidence,
+        Match.created_at,
+        lost_item.item_name.label("lost_name"),
+        lost_item.description.label("lost_description"),
+        lost_item.tracking_token.label("lost_token"),
+        found_item.item_name.label("found_name"),
+        found_item.description.label("found_description"),
+        found_item.tracking_token.label("found_token")
+    ).join(
+        lost_item, lost_item.id == Match.lost_item_id
+    ).join(
+        found_item, found_item.id == Match.found_item_id
+    ).filter(
+        Match.is_match == 1
+    )
+    
+    if cursor is not None:
+        query = query.filter(Match.id < cursor)
+    
+    rows = query.order_by(Match.id.desc()).limit(limit).all()
+    
+    results = [
+        {
+            "match_id": row.id,
+            "confidence": round(row.confidence, 2),
+            "lost_item": {
+                "name": row.lost_name,
+                "description": row.lost_description,
+                "token": row.lost_token
+            },
+            "found_item": {
+                "name": row.found_name,
+                "description": row.found_description,
+                "token": row.found_token
+            },
+            "matched_at": row.created_at.isoformat() if row.created_at else None
+        }
+        for row in rows
+    ]
+    
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = rows[-1].id
+    
+    return {
+        "status": "success",
+        "recent_matches": results,
+        "next_cursor": next_cursor
+    }
+
+
 @router.get("/search/{tracking_token}")
 async def search_matches(
     tracking_token: str,
     top_k: int = 5,
+    refresh: bool = False,
     db: Session = Depends(get_db)
 ):
     """
     Search for matching items using tracking token
     
+    While the background matching job is still queued or running a
+    "pending" status is returned. Otherwise only candidates uploaded since
+    the item's last search are scored and merged with the stored results,
+    so polling costs O(new uploads).
+    
     Args:
         tracking_token: The token received when uploading an item
         top_k: Number of top matches to return (default: 5)
+        refresh: Ignore stored results and search the whole inventory again
     
     Returns:
         List of potential matches with confidence scores
     """
-    print(f"\n{'='*60}")
-    print(f"🔍 SEARCH REQUEST for token: {tracking_token}")
-    print(f"{'='*60}")
-    
-    # Find the query item
-    query_item = db.query(Item).filter(
+    # Find the query item (the search itself loads it in the executor)
+    query_item = db.query(Item.id).filter(
         Item.tracking_token == tracking_token
     ).first()
     
     if not query_item:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    print(f"✅ Query item found:")
-    print(f"   ID: {query_item.id}")
-    print(f"   Type: {query_item.item_type.value}")
-    print(f"   Name: {query_item.item_name}")
-    print(f"   Description: {query_item.description}")
-    
-    # Determine search direction
-    if query_item.item_type == ItemType.LOST:
-        # Search in found items
-        candidate_items = db.query(Item).filter(
-            Item.item_type == ItemType.FOUND
-        ).all()
-        search_type = "FOUND"
-        print(f"\n🔎 Searching for FOUND items (Lost item searching)")
-    else:
-        # Search in lost items
-        candidate_items = db.query(Item).filter(
-            Item.item_type == ItemType.LOST
-        ).all()
-        search_type = "LOST"
-        print(f"\n🔎 Searching for LOST items (Found item searching)")
+    job = match_queue.get_status(tracking_token)
+    if job and not refresh:
+        if job["status"] in ("queued", "running") and match_queue.running:
+            return {
+                "status": "pending",
+                "message": "Matching is in progress, check back shortly",
+                "job": job
+            }
     
-    print(f"   Total candidates: {len(candidate_items)}")
+    # Scoring is CPU-bound; run it in the inference pool (429 when saturated)
+    try:
+        return await inference_executor.run(search_by_token, tracking_token, top_k, refresh)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Item not found")
+
+
+@router.get("/search/{tracking_token}/stream")
+async def stream_search(
+    tracking_token: str,
+    request: Request,
+    top_k: int = 5,
+    refresh: bool = False,
+    format: str = "ndjson",
+    db: Session = Depends(get_db)
+):
+    """
+    Streaming variant of /search/{tracking_token}
     
-    if not candidate_items:
-        return {
-            "status": "no_candidates",
-            "message": f"No {search_type} items available to match",
-            "query_item": {
-                "id": query_item.id,
-                "token": query_item.tracking_token,
-                "type": query_item.item_type.value,
-                "name": query_item.item_name,
-                "description": query_item.description
-            },
-            "matches": []
-        }
+    Emits a "started" event, then "progress" events (stage 1 done, then
+    every SEARCH_STREAM_BATCH candidates scored by stage 2) carrying the
+    provisional top_matches, and finally a "result" event with the same
+    payload /search/{tracking_token} returns, or an "error" event with a
+    status_code. Closing the connection cancels the search at the next
+    batch boundary.
     
-    # Load query image
-    query_image_full_path = os.path.join("static", query_item.image_path)
-    print(f"\n📸 Loading query image from: {query_image_full_path}")
+    With INFERENCE_EXECUTOR=process only "started" and the final event
+    are sent, since callbacks cannot cross the process boundary.
     
-    if not os.path.exists(query_image_full_path):
-        print(f"❌ Query image not found at: {query_image_full_path}")
-        raise HTTPException(status_code=500, detail=f"Query image not found: {query_item.image_path}")
+    Args:
+        tracking_token: The token received when uploading an item
+        top_k: Number of top matches to return (default: 5)
+        refresh: Ignore stored results and search the whole inventory again
+        format: "ndjson" (one JSON object per line) or "sse" (text/event-stream)
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
     
-    query_img = load_clean_image(query_item.image_path)
-    if query_img is None:
-        print(f"❌ Failed to load query image")
-        raise HTTPException(status_code=500, detail="Failed to load query image")
+    query_item = db.query(Item.id).filter(
+        Item.tracking_token == tracking_token
+    ).first()
     
-    print(f"✅ Query image loaded successfully")
+    if not query_item:
+        raise HTTPException(status_code=404, detail="Item not found")
     
-    # Extract features and compute matches
-    matches = []
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    cancel = threading.Event()
     
-    print(f"\n🤖 Starting ML matching process...")
-    print(f"{'='*60}")
+    def on_progress(event: Dict):
+        # Called on the inference thread
+        loop.call_soon_threadsafe(events.put_nowait, event)
     
-    for idx, candidate in enumerate(candidate_items, 1):
+    async def run_search():
+        callbacks = {}
+        if inference_executor.mode != "process":
+            callbacks = {"on_progress": on_progress, "cancel": cancel}
         try:
-            print(f"\n[{idx}/{len(candidate_items)}] Processing candidate ID: {candidate.id}")
-            print(f"   Name: {candidate.item_name}")
-            print(f"   Description: {candidate.description}")
-            
-            # Load candidate image
-            candidate_image_full_path = os.path.join("static", candidate.image_path)
-            print(f"   Image path: {candidate_image_full_path}")
-            
-            if not os.path.exists(candidate_image_full_path):
-                print(f"   ⚠️ Candidate image not found, skipping...")
-                continue
-            
-            candidate_img = load_clean_image(candidate.image_path)
-            if candidate_img is None:
-                print(f"   ⚠️ Failed to load candidate image, skipping...")
-                continue
-            
-            print(f"   ✅ Candidate image loaded")
-            
-            # Extract all features
-            print(f"   🔧 Extracting features...")
-            features = feature_extractor.extract_all_features(
-                img1=query_img,
-                img2=candidate_img,
-                text1=query_item.description,
-                text2=candidate.description,
-                item_name=query_item.item_name
-            )
-            
-            print(f"   📊 Features extracted:")
-            print(f"      DINOv2: {features[0]:.4f}")
-            print(f"      SIFT: {features[1]:.4f}")
-            print(f"      Text: {features[2]:.4f}")
-            print(f"      Name: {features[3]:.4f}")
-            print(f"      Color: {features[4]:.4f}")
-            
-            # Get ML prediction
-            prediction, confidence = ml_service.predict(features)
-            
-            print(f"   🎯 ML Prediction:")
-            print(f"      Confidence: {confidence:.4f} ({confidence*100:.2f}%)")
-            print(f"      Is Match: {'YES ✅' if prediction == 1 else 'NO ❌'}")
-            
-            # Store match result in database
-            if query_item.item_type == ItemType.LOST:
-                lost_id = query_item.id
-                found_id = candidate.id
-            else:
-                lost_id = candidate.id
-                found_id = query_item.id
-            
-            match_record = Match(
-                lost_item_id=lost_id,
-                found_item_id=found_id,
-                overall_score=float(confidence),
-                dino_similarity=float(features[0]),
-                sift_similarity=float(features[1]),
-                text_similarity=float(features[2]),
-                item_name_similarity=float(features[3]),
-                color_match=float(features[4]),
-                is_match=int(prediction),
-                confidence=float(confidence * 100)
-            )
-            
-            db.add(match_record)
-            
-            # Add to results
-            matches.append({
-                "candidate_id": candidate.id,
-                "candidate_token": candidate.tracking_token,
-                "item_name": candidate.item_name,
-                "description": candidate.description,
-                "image_url": f"/static/{candidate.image_path}",
-                "contact_info": candidate.contact_info,
-                "is_match": bool(prediction),
-                "confidence": round(confidence * 100, 2),
-                "similarity_breakdown": {
-                    "visual_similarity": round(float(features[0]) * 100, 2),
-                    "texture_similarity": round(float(features[1]) * 100, 2),
-                    "description_similarity": round(float(features[2]) * 100, 2),
-                    "name_similarity": round(float(features[3]) * 100, 2),
-                    "color_match": "Yes" if features[4] > 0.7 else "No"
-                }
-            })
-        
+            result = await inference_executor.run(search_by_token, tracking_token, top_k, refresh, **callbacks)
+            await events.put({"event": "result", "data": result})
+        except SearchCancelled:
+            await events.put(None)
+        except LookupError:
+            await events.put({"event": "error", "status_code": 404, "detail": "Item not found"})
+        except HTTPException as e:
+            await events.put({"event": "error", "status_code": e.status_code, "detail": e.detail})
         except Exception as e:
-            print(f"   ❌ Error processing candidate {candidate.id}: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            continue
+            logger.exception("❌ Streaming search failed for %s: %s", tracking_token, e)
+            await events.put({"event": "error", "status_code": 500, "detail": "Search failed"})
     
-    # Commit match records
-    try:
-        db.commit()
-        print(f"\n✅ Match records saved to database")
-    except Exception as e:
-        print(f"⚠️ Failed to save match records: {e}")
-        db.rollback()
-    
-    # Sort by confidence and get top K
-    matches.sort(key=lambda x: x['confidence'], reverse=True)
-    top_matches = matches[:top_k]
+    def encode(event: Dict) -> str:
+        if format == "sse":
+            return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+        return json.dumps(event, default=str) + "\n"
     
-    print(f"\n{'='*60}")
-    print(f"📊 SEARCH RESULTS SUMMARY")
-    print(f"{'='*60}")
-    print(f"Total candidates checked: {len(candidate_items)}")
-    print(f"Total matches found: {len([m for m in matches if m['is_match']])}")
-    print(f"Top {min(top_k, len(matches))} matches returned")
-    print(f"{'='*60}\n")
-    
-    return {
-        "status": "success",
-        "query_item": {
-            "id": query_item.id,
-            "token": query_item.tracking_token,
-            "type": query_item.item_type.value,
-            "name": query_item.item_name,
-            "description": query_item.description
-        },
-        "total_candidates_checked": len(candidate_items),
-        "total_matches_found": len([m for m in matches if m['is_match']]),
-        "top_matches": top_matches
-    }
+    async def stream():
+        task = asyncio.create_task(run_search())
+        try:
+            yield encode({"event": "started", "tracking_token": tracking_token, "top_k": top_k})
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    continue
+                if event is None:
+                    break
+                yield encode(event)
+                if event["event"] in ("result", "error"):
+                    break
+        finally:
+            # Client gone (or stream done): stop scoring at the next batch
+            if not task.done():
+                cancel.set()
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type, headers={"Cache-Control": "no-cache"})
 
 
-@router.get("/search/recent-matches")
-async def get_recent_matches(
-    limit: int = 10,
-    db: Session = Depends(get_db)
-):
-    """Get recent successful matches"""
-    recent = db.query(Match).filter(
-        Match.is_match == 1
-    ).order_by(
-        Match.created_at.desc()
-    ).limit(limit).all()
-    
-    results = []
-    for match in recent:
-        lost_item = db.query(Item).get(match.lost_item_id)
-        found_item = db.query(Item).get(match.found_item_id)
-        
-        if lost_item and found_item:
-            results.append({
-                "match_id": match.id,
-                "confidence": round(match.confidence, 2),
-                "lost_item": {
-                    "name": lost_item.item_name,
-                    "description": lost_item.description,
-                    "token": lost_item.tracking_token
-                },
-                "found_item": {
-                    "name": found_item.item_name,
-                    "description": found_item.description,
-                    "token": found_item.tracking_token
-                },
-                "matched_at": match.created_at.isoformat() if match.created_at else None
-            })
+@router.get("/search/{tracking_token}/status")
+async def get_matching_status(tracking_token: str):
+    """Get the background matching job status for an item"""
+    job = match_queue.get_status(tracking_token)
+    if not job:
+        raise HTTPException(status_code=404, detail="No matching job for this tracking token")
     
     return {
         "status": "success",
-        "recent_matches": results
-    }
\ No newline at end of file
+        "job": job
+    }
@@ -6,14 +6,63 @@ from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.models.database_models import Item, ItemType
 from app.core.security import generate_tracking_token
-from app.services.image_processor import process_and_save_image
-from datetime import datetime
-import os
-
+from app.services.image_processor import (
+    process_and_save_image, load_clean_image, save_sift_descriptors, delete_saved_image
+)
+from app.services.feature_extractor import feature_extractor
+from app.services.feature_store import feature_store
+from app.services.vector_index import get_vector_index
+from app.services.match_queue import match_queue
+from app.services.inference_executor import inference_executor
+from app.services.metrics import stage_timer
+from typing import Optional, Tuple
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-#helpar FUNCTION for upload new item
+def compute_image_features(image_path: str) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    Compute the per-item image features once at upload time
+    
+    The SIFT descriptors are written to the item's sidecar once the item
+    is committed and has its id. Either value is None on failure; search
+    backfills missing features.
+    
+    Returns:
+        (DINOv2 embedding, SIFT descriptors)
+    """
+    img = load_clean_image(image_path)
+    if img is None:
+        return None, None
+    
+    dino_embedding = None
+    try:
+        dino_embedding = feature_extractor.extract_dino_embedding(img)
+    except Exception as e:
+        logger.warning("DINOv2 embedding failed for %s: %s", image_path, e)
+    
+    sift_descriptors = None
+    try:
+        sift_descriptors = feature_extractor.compute_sift_descriptors(img)
+        if sift_descriptors is None:
+            sift_descriptors = np.empty((0, 128), dtype=np.float32)
+    except Exception as e:
+        logger.warning("SIFT extraction failed for %s: %s", image_path, e)
+    
+    return dino_embedding, sift_descriptors
+
+
+def compute_text_embedding(text: str) -> Optional[np.ndarray]:
+    """Bi-encoder embedding of the item text, None on failure (search backfills)"""
+    try:
+        return feature_extractor.extract_text_embedding(text)
+    except Exception as e:
+        logger.warning("Text embedding failed: %s", e)
+        return None
+
 
 async def handle_item_upload(
         
@@ -25,6 +74,14 @@ async def handle_item_upload(
     db: Session
 
 ):
+    """
+    Save the image, compute its features and store the item
+    
+    Only background removal may be refused with 429: once the image is
+    saved the later stages queue (wait=True) rather than discard the work.
+    If anything fails before the commit the saved image is deleted.
+    """
+    orphaned_image = None
     try:
         tracking_token = generate_tracking_token()
         image_path = await process_and_save_image(
@@ -32,21 +89,56 @@ async def handle_item_upload(
             item_type=item_type.value,
             tracking_token=tracking_token
         )
+        orphaned_image = image_path
+        dino_embedding, sift_descriptors = await inference_executor.run(
+            compute_image_features, image_path, wait=True
+        )
+        item_name = item_name.strip().lower()
+        description = description.strip().lower()
+        text_embedding = await inference_executor.run(
+            compute_text_embedding, f"{item_name}. {description}", wait=True
+        )
         new_item = Item(
             tracking_token=tracking_token,
             item_type=item_type,
-            item_name=item_name.strip().lower(),
-            description=description.strip().lower(),
+            item_name=item_name,
+            description=description,
             image_path=image_path,
             contact_info=contact_info,
+            sift_keypoints=len(sift_descriptors) if sift_descriptors is not None else None,
         )
         db.add(new_item)
-        db.commit()
+        db.flush()  # assigns new_item.id for the feature rows
+        embeddings = [
+            (kind, embedding)
+            for kind, embedding in (("dino", dino_embedding), ("text", text_embedding))
+            if embedding is not None
+        ]
+        for kind, embedding in embeddings:
+            feature_store.put(db, new_item.id, kind, embedding)
+        with stage_timer("db_commit"):
+            db.commit()
+        orphaned_image = None  # the stored item owns the image now
         db.refresh(new_item)
+        if sift_descriptors is not None:
+            try:
+                save_sift_descriptors(new_item.id, image_path, sift_descriptors)
+            except Exception as e:
+                # Search recomputes missing descriptors
+                logger.warning("SIFT sidecar write failed for item %s: %s", new_item.id, e)
+        for kind, embedding in embeddings:
+            try:
+                get_vector_index(f"{kind}_{item_type.value}").add(new_item.id, embedding)
+            except Exception as e:
+                # The next search re-syncs the index from the DB
+                logger.warning("Vector index update failed for item %s: %s", new_item.id, e)
+        match_queue.enqueue(tracking_token)
         return new_item, tracking_token
-    except Exception as e:
+    except Exception:
         db.rollback()
-        raise e
+        if orphaned_image is not None:
+            delete_saved_image(orphaned_image)
+        raise
 
 
 
@@ -68,7 +160,8 @@ async def upload_lost_item(
     """
     Upload a lost item
     
-    Returns tracking token for future queries
+    Returns tracking token for future queries and queues matching
+    against found items
     """
     try:
         item, token = await handle_item_upload(ItemType.LOST, item_name, description, contact_info, image, db)
@@ -76,8 +169,11 @@ async def upload_lost_item(
             "status": "success",
             "tracking_token": token,
             "item_id": item.id,
+            "matching_job": match_queue.get_status(token),
             "message": "Lost item uploaded successfully"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -104,8 +200,11 @@ async def upload_found_item(
             "status": "success",
             "tracking_token": token,
             "item_id": item.id,
+            "matching_job": match_queue.get_status(token),
             "message": "Found item uploaded successfully"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
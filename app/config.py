@@ -18,6 +18,75 @@ class Settings:
     MODEL_DIR: str = os.getenv("MODEL_DIR", "./ml_models")
 
     
+    # Candidate retrieval (vector index)
+    SEARCH_CANDIDATES: int = int(os.getenv("SEARCH_CANDIDATES", "100"))
+    ANN_BRUTE_FORCE_MAX: int = int(os.getenv("ANN_BRUTE_FORCE_MAX", "20000"))
+    ANN_NLIST: int = int(os.getenv("ANN_NLIST", "0"))  # 0 = sqrt(index size)
+    ANN_NPROBE: int = int(os.getenv("ANN_NPROBE", "8"))
+    EMBEDDING_COMPACT_RATIO: float = float(os.getenv("EMBEDDING_COMPACT_RATIO", "0.25"))  # dead rows before compaction
+
+    # Decoded image / DINOv2 input caches (per process, 0 disables)
+    IMAGE_CACHE_MB: float = float(os.getenv("IMAGE_CACHE_MB", "256"))
+    DINO_INPUT_CACHE_MB: float = float(os.getenv("DINO_INPUT_CACHE_MB", "0"))
+
+    # Feature store (per-item embedding blobs)
+    FEATURE_STORE_DTYPE: str = os.getenv("FEATURE_STORE_DTYPE", "float16")  # float16 | float32
+
+    # Model inference backend
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "torch")  # torch | onnx
+    ONNX_INTRA_OP_THREADS: int = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))  # 0 = ORT default
+    ONNX_INTER_OP_THREADS: int = int(os.getenv("ONNX_INTER_OP_THREADS", "0"))
+    MODEL_PRECISION: str = os.getenv("MODEL_PRECISION", "fp32")  # fp32 | bf16 (torch only) | int8 (dynamic, CPU)
+
+    # Upload ingestion
+    MAX_IMAGE_SIZE_MB: float = float(os.getenv("MAX_IMAGE_SIZE_MB", "10"))
+    MAX_IMAGE_MEGAPIXELS: float = float(os.getenv("MAX_IMAGE_MEGAPIXELS", "50"))  # decoded size guard
+    UPLOAD_CHUNK_KB: int = int(os.getenv("UPLOAD_CHUNK_KB", "256"))
+
+    # Background removal (rembg)
+    REMBG_MODEL: str = os.getenv("REMBG_MODEL", "u2net")  # u2net | u2netp | silueta | isnet-general-use | ...
+    REMBG_DOWNSCALE: bool = os.getenv("REMBG_DOWNSCALE", "true").lower() == "true"  # segment at working size
+    REMBG_WORKING_SIZE: int = int(os.getenv("REMBG_WORKING_SIZE", "0"))  # longest side; 0 = model input size
+    REMBG_INTRA_OP_THREADS: int = int(os.getenv("REMBG_INTRA_OP_THREADS", "0"))  # 0 = ORT default
+    REMBG_INTER_OP_THREADS: int = int(os.getenv("REMBG_INTER_OP_THREADS", "0"))
+
+    # Two-stage matching cascade
+    CASCADE_ENABLED: bool = os.getenv("CASCADE_ENABLED", "true").lower() == "true"
+    CASCADE_TOP_M: int = int(os.getenv("CASCADE_TOP_M", "20"))  # survivors that get SIFT + reranker
+    CASCADE_TEXT_TOP_M: int = int(os.getenv("CASCADE_TEXT_TOP_M", "10"))  # extra survivors by text cosine
+    SEARCH_STREAM_BATCH: int = int(os.getenv("SEARCH_STREAM_BATCH", "4"))  # stage-2 batch per streamed update
+
+    # DINOv2 micro-batching across concurrent requests
+    DINO_BATCH_MAX_SIZE: int = int(os.getenv("DINO_BATCH_MAX_SIZE", "8"))  # 1 disables batching
+    DINO_BATCH_MAX_WAIT_MS: float = float(os.getenv("DINO_BATCH_MAX_WAIT_MS", "5"))
+
+    # Bi-encoder text embeddings (stored per item, used for retrieval/prefiltering)
+    TEXT_EMBEDDING_MODEL: str = os.getenv("TEXT_EMBEDDING_MODEL", "intfloat/multilingual-e5-small")
+    TEXT_EMBEDDING_PREFIX: str = os.getenv("TEXT_EMBEDDING_PREFIX", "query: ")
+
+    # Text reranker
+    RERANKER_BATCH_SIZE: int = int(os.getenv("RERANKER_BATCH_SIZE", "16"))
+
+    # SIFT matching
+    SIFT_MATCH_CHUNK: int = int(os.getenv("SIFT_MATCH_CHUNK", "16384"))  # descriptors per distance block
+    SIFT_FLANN_MIN_DESCRIPTORS: int = int(os.getenv("SIFT_FLANN_MIN_DESCRIPTORS", "2000"))
+
+    # Background matching jobs
+    MATCH_QUEUE_WORKERS: int = int(os.getenv("MATCH_QUEUE_WORKERS", "1"))  # 0 disables the queue
+    MATCH_QUEUE_DB: str = os.getenv("MATCH_QUEUE_DB", "")  # SQLite file for a durable queue
+
+    # Inference executor
+    INFERENCE_EXECUTOR: str = os.getenv("INFERENCE_EXECUTOR", "thread")  # thread | process
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", "2"))
+    INFERENCE_QUEUE_LIMIT: int = int(os.getenv("INFERENCE_QUEUE_LIMIT", "8"))
+
+    # Startup
+    DB_CREATE_ALL: bool = os.getenv("DB_CREATE_ALL", "true").lower() == "true"
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+
+    # Logging / metrics
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")  # DEBUG logs every stage timing
+
     # Device setup
     DEVICE: str = os.getenv("DEVICE", "cpu")
 
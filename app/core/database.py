@@ -1,9 +1,11 @@
 """
 Database Configuration
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Dict, List
 import os
 from dotenv import load_dotenv
 
@@ -29,6 +31,35 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base class for models
 Base = declarative_base()
 
+def upsert(db: Session, model, rows: List[Dict], key_columns: List[str]):
+    """
+    Insert rows in one statement, updating the other columns of rows whose
+    unique key already exists
+
+    Uses ON DUPLICATE KEY UPDATE on MySQL and ON CONFLICT DO UPDATE on
+    SQLite and PostgreSQL, so concurrent writers of the same key both
+    succeed (the last one wins). Other dialects get a plain insert.
+    """
+    if not rows:
+        return
+    update_columns = [column for column in rows[0] if column not in key_columns]
+    
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(model).values(rows)
+        stmt = stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in update_columns})
+    elif dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = dialect_insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: stmt.excluded[column] for column in update_columns}
+        )
+    else:
+        db.execute(insert(model), rows)
+        return
+    db.execute(stmt)
+
 # Dependency for FastAPI routes
 def get_db():
     """
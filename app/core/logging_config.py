@@ -0,0 +1,16 @@
+"""
+Logging - One root handler for the app, level from LOG_LEVEL
+"""
+from app.config import settings
+import logging
+
+
+def setup_logging(level: str = settings.LOG_LEVEL):
+    """
+    Log app.* messages at `level` (DEBUG adds per-stage timings)
+
+    Uvicorn keeps its own handlers; this only adds a root handler if
+    nothing configured one yet.
+    """
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger("app").setLevel(level.upper())
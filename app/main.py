@@ -1,21 +1,89 @@
 import os
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
 from app.config import settings
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.api.routes import search, tracking, upload
 
 from app.core.database import engine, Base 
-
-
-
-Base.metadata.create_all(bind=engine)
+from app.core.logging_config import setup_logging
+from app.services.match_queue import match_queue
+from app.services.inference_executor import inference_executor
+from app.services.feature_extractor import feature_extractor
+from app.services.ml_service import ml_service
+from app.services.image_processor import get_rembg_session, rembg_loaded
+from app.services.metrics import metrics, request_seconds
+
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+# Startup state reported by /ready
+startup_state = {"database": "pending", "warmup": "idle"}
+_background_tasks = set()
+
+
+def create_tables():
+    """Create missing tables; failures are reported by /ready instead of crashing startup"""
+    try:
+        Base.metadata.create_all(bind=engine)
+        startup_state["database"] = "ok"
+    except Exception as e:
+        logger.error("⚠️ Database initialization failed: %s", e)
+        startup_state["database"] = f"error: {e}"
+
+
+def warmup_models():
+    """Load every model so the first upload/search does not pay for it"""
+    startup_state["warmup"] = "running"
+    try:
+        feature_extractor.warmup()
+        ml_service.ensure_loaded()
+        get_rembg_session()
+        startup_state["warmup"] = "done"
+    except Exception as e:
+        logger.error("⚠️ Model warm-up failed: %s", e)
+        startup_state["warmup"] = f"error: {e}"
+
+
+def start_warmup():
+    """Warm the models in a background thread without blocking requests"""
+    if startup_state["warmup"] in ("running", "done"):
+        return
+    startup_state["warmup"] = "running"
+    task = asyncio.create_task(asyncio.to_thread(warmup_models))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_CREATE_ALL:
+        await asyncio.to_thread(create_tables)
+    else:
+        startup_state["database"] = "skipped"
+    
+    if settings.WARMUP_ON_STARTUP:
+        start_warmup()
+    
+    # Background matching workers
+    await match_queue.start()
+    yield
+    await match_queue.stop()
+    inference_executor.shutdown()
 
 
 app = FastAPI(
     title="Lost & Found System API",
     description="AI-powered Lost & Found matching system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 
@@ -27,6 +95,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Record request latency by route template and log it"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    
+    route = request.scope.get("route")
+    request_seconds.observe(
+        elapsed,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code
+    )
+    logger.info("%s %s %d %.1fms", request.method, request.url.path, response.status_code, elapsed * 1000)
+    return response
+
+
 UPLOAD_LOST = os.path.join(settings.UPLOAD_DIR, "lost")
 UPLOAD_FOUND = os.path.join(settings.UPLOAD_DIR, "found")
 
@@ -56,4 +142,35 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Report which models are loaded; 503 until all of them are"""
+    models = dict(feature_extractor.loaded_models())
+    models["xgboost"] = ml_service.model is not None
+    models["rembg"] = rembg_loaded()
+    ready = all(models.values())
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "models": models,
+            **startup_state
+        }
+    )
+
+
+@app.post("/warmup")
+async def warmup():
+    """Start loading all models in the background"""
+    start_warmup()
+    return {"status": "accepted", "warmup": startup_state["warmup"]}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Latency histograms and counters of this process (Prometheus text format)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,8 +1,7 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Float, DateTime, Text, Enum
+from sqlalchemy import Column, ForeignKey, Integer, String, Float, DateTime, Text, Enum, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 import enum
-from sqlalchemy.dialects.mysql import LONGTEXT
 
 class ItemType(enum.Enum):
     LOST = "lost"
@@ -10,6 +9,10 @@ class ItemType(enum.Enum):
 
 class Item(Base):
     __tablename__ = "items"
+    __table_args__ = (
+        # Candidates newer than a search watermark: item_type = ? AND id > ? ORDER BY id
+        Index("ix_items_type_id", "item_type", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     tracking_token = Column(String(50), unique=True, index=True)
@@ -18,14 +21,33 @@ class Item(Base):
     description = Column(Text, nullable=False)
     image_path = Column(String(500), nullable=False)
     contact_info = Column(String(200))
-    dino_feature = Column(LONGTEXT)
     sift_keypoints = Column(Integer)
-    text_embedding = Column(LONGTEXT)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+class ItemFeature(Base):
+    """One stored embedding of an item, raw vector bytes versioned by model"""
+    __tablename__ = "item_features"
+    __table_args__ = (
+        UniqueConstraint("item_id", "kind", "model_name", name="uq_item_feature"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String(20), nullable=False)  # dino | text
+    model_name = Column(String(200), nullable=False)
+    dtype = Column(String(10), nullable=False)  # float16 | float32
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Match(Base):
     __tablename__ = "matches"
+    __table_args__ = (
+        UniqueConstraint("lost_item_id", "found_item_id", "model_version", name="uq_match_pair_version"),
+        # Recent-matches feed: WHERE is_match = 1 ORDER BY id DESC
+        Index("ix_matches_is_match_id", "is_match", "id"),
+    )
     
     id = Column(Integer, primary_key=True)
     
@@ -41,4 +63,15 @@ class Match(Base):
     color_match = Column(Float)
     is_match = Column(Integer)
     confidence = Column(Float)
+    model_version = Column(String(64), nullable=False, default="legacy")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class SearchWatermark(Base):
+    """Newest candidate already considered for a query item (compared by candidate_id)"""
+    __tablename__ = "search_watermarks"
+    
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), primary_key=True)
+    model_version = Column(String(64), nullable=False)
+    candidate_created_at = Column(DateTime(timezone=True), nullable=False)
+    candidate_id = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,277 @@
+"""
+Embedding Matrix - Append-only, memory-mapped store of item vectors
+Shared by every worker process through the OS page cache
+"""
+from app.config import settings
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import threading
+import logging
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingMatrix:
+    """
+    One contiguous float32 matrix of vectors plus a parallel log of item ids
+
+    On disk, per generation:
+        {name}.{generation}.vec   raw float32 rows of `dim` values
+        {name}.{generation}.ids   one int64 per row: the item id, or
+                                  -(id + 1) for a tombstone (zero vector)
+        {name}.meta.json          current generation and dim
+
+    Writes only ever append (vector first, then id, so a reader never sees
+    an id without its row) under an exclusive file lock. A re-added id
+    supersedes its older row; a tombstone hides it. Readers map the .vec
+    file with np.memmap and replay only the ids appended since their last
+    refresh. Compaction copies the live rows of a snapshot into the next
+    generation outside the lock and switches the meta file atomically.
+    """
+
+    def __init__(self, directory: Path, name: str, compact_ratio: float = settings.EMBEDDING_COMPACT_RATIO):
+        self.directory = Path(directory)
+        self.name = name
+        self.compact_ratio = compact_ratio
+
+        self.generation = -1
+        self.dim = 0
+        self.rows = 0
+        self.vectors: Optional[np.ndarray] = None
+        self.row_ids = np.empty(0, dtype=np.int64)
+        self.live = np.empty(0, dtype=bool)
+        self.row_of: Dict[int, int] = {}
+
+        self._lock = threading.RLock()
+        self._compactor: Optional[threading.Thread] = None
+
+        self.refresh()
+
+    # ------------------------------------------------------------------
+    # Files
+    # ------------------------------------------------------------------
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.directory / f"{self.name}.meta.json"
+
+    def _vec_path(self, generation: int) -> Path:
+        return self.directory / f"{self.name}.{generation}.vec"
+
+    def _ids_path(self, generation: int) -> Path:
+        return self.directory / f"{self.name}.{generation}.ids"
+
+    def _read_meta(self) -> Optional[Dict]:
+        try:
+            return json.loads(self._meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, generation: int, dim: int):
+        tmp_path = self._meta_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"generation": generation, "dim": dim}))
+        os.replace(tmp_path, self._meta_path)
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize writers across threads and (where supported) processes"""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / f"{self.name}.lock", "a+") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    def __contains__(self, item_id: int) -> bool:
+        return int(item_id) in self.row_of
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Live item ids, in row order"""
+        return self.row_ids[self.live]
+
+    @property
+    def dead_ratio(self) -> float:
+        return 1.0 - len(self.row_of) / self.rows if self.rows else 0.0
+
+    def snapshot(self) -> Tuple[Optional[np.ndarray], np.ndarray, np.ndarray]:
+        """Consistent (vectors, row_ids, live) for a reader"""
+        with self._lock:
+            return self.vectors, self.row_ids, self.live
+
+    def refresh(self) -> bool:
+        """
+        Pick up rows appended (or a compaction done) by any process
+
+        Returns:
+            True if anything changed
+        """
+        with self._lock:
+            meta = self._read_meta()
+            if meta is None:
+                return False
+
+            generation, dim = int(meta["generation"]), int(meta["dim"])
+            changed = generation != self.generation
+            if changed:
+                self.generation, self.dim = generation, dim
+                self.rows = 0
+                self.vectors = None
+                self.row_ids = np.empty(0, dtype=np.int64)
+                self.live = np.empty(0, dtype=bool)
+                self.row_of = {}
+
+            vec_path, ids_path = self._vec_path(generation), self._ids_path(generation)
+            if not vec_path.exists() or not ids_path.exists():
+                return changed
+            rows = min(ids_path.stat().st_size // 8, vec_path.stat().st_size // (4 * dim))
+            if rows == self.rows:
+                return changed
+
+            new_ids = np.fromfile(ids_path, dtype=np.int64, count=rows - self.rows, offset=self.rows * 8)
+            row_ids = np.concatenate([self.row_ids, new_ids])
+            live = np.concatenate([self.live, np.zeros(len(new_ids), dtype=bool)])
+            row_of = dict(self.row_of)
+            for row, entry in enumerate(new_ids.tolist(), start=self.rows):
+                item_id = entry if entry >= 0 else -entry - 1
+                previous = row_of.pop(item_id, None)
+                if previous is not None:
+                    live[previous] = False
+                if entry >= 0:
+                    row_of[item_id] = row
+                    live[row] = True
+
+            # Swap in whole new arrays so concurrent snapshots stay consistent
+            self.vectors = np.memmap(vec_path, dtype=np.float32, mode="r", shape=(rows, dim))
+            self.row_ids, self.live, self.row_of, self.rows = row_ids, live, row_of, rows
+            return True
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, item_ids: List[int], vectors: np.ndarray):
+        """Append (or supersede) the vectors of items"""
+        if len(item_ids) == 0:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(item_ids), -1)
+        self._append(np.asarray(item_ids, dtype=np.int64), vectors)
+
+    def delete(self, item_ids: List[int]):
+        """Tombstone items; their rows are dropped at the next compaction"""
+        item_ids = [int(i) for i in item_ids if int(i) in self.row_of]
+        if not item_ids or self.dim == 0:
+            return
+        entries = -np.asarray(item_ids, dtype=np.int64) - 1
+        self._append(entries, np.zeros((len(entries), self.dim), dtype=np.float32))
+
+    def _append(self, entries: np.ndarray, vectors: np.ndarray):
+        with self._file_lock():
+            self.refresh()
+            if self._read_meta() is None:
+                self._write_meta(0, vectors.shape[1])
+                self.refresh()
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"{self.name}: expected dim {self.dim}, got {vectors.shape[1]}")
+
+            # Trim a torn write left by a crashed writer before appending
+            for path, row_size in ((self._vec_path(self.generation), 4 * self.dim), (self._ids_path(self.generation), 8)):
+                with open(path, "ab") as f:
+                    f.truncate(self.rows * row_size)
+            with open(self._vec_path(self.generation), "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._ids_path(self.generation), "ab") as f:
+                f.write(entries.tobytes())
+            self.refresh()
+
+        if self.dead_ratio > self.compact_ratio:
+            self.compact_in_background()
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+
+    def compact(self, chunk_rows: int = 10000):
+        """
+        Rewrite only the live rows into a new generation
+
+        The bulk copy reads a snapshot without holding the lock, so appends
+        carry on meanwhile. The lock is taken again only to replay the rows
+        appended since the snapshot and to switch the meta file.
+        """
+        with self._file_lock():
+            self.refresh()
+            if self.rows == 0 or self.dead_ratio == 0:
+                return
+            old_generation, copied = self.generation, self.rows
+            vectors, row_ids, live = self.vectors, self.row_ids, self.live
+        new_generation = old_generation + 1
+        rows = np.flatnonzero(live)
+
+        suffix = f".{os.getpid()}.compact"
+        vec_tmp = self._vec_path(new_generation).with_name(self._vec_path(new_generation).name + suffix)
+        ids_tmp = self._ids_path(new_generation).with_name(self._ids_path(new_generation).name + suffix)
+        with open(vec_tmp, "wb") as f:
+            for start in range(0, len(rows), chunk_rows):
+                f.write(np.ascontiguousarray(vectors[rows[start:start + chunk_rows]]).tobytes())
+        row_ids[rows].tofile(ids_tmp)
+
+        with self._file_lock():
+            self.refresh()
+            if self.generation != old_generation:  # another process compacted first
+                vec_tmp.unlink(missing_ok=True)
+                ids_tmp.unlink(missing_ok=True)
+                return
+            # Replay rows (and tombstones) appended during the copy
+            if self.rows > copied:
+                with open(vec_tmp, "ab") as f:
+                    f.write(np.ascontiguousarray(self.vectors[copied:self.rows]).tobytes())
+                with open(ids_tmp, "ab") as f:
+                    f.write(self.row_ids[copied:self.rows].tobytes())
+            os.replace(vec_tmp, self._vec_path(new_generation))
+            os.replace(ids_tmp, self._ids_path(new_generation))
+            self._write_meta(new_generation, self.dim)
+            self.refresh()
+
+            for path in self.directory.glob(f"{self.name}.*"):
+                parts = path.name[len(self.name) + 1:].split(".")
+                if len(parts) >= 2 and parts[0].isdigit() and int(parts[0]) < new_generation:
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass  # still mapped on Windows; removed by a later compaction
+        logger.info("🧹 Compacted %s: %d live rows (generation %d)", self.name, len(self), new_generation)
+
+    def compact_in_background(self):
+        """Start compaction on a daemon thread unless one is already running"""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self._compact_safely, name=f"compact-{self.name}", daemon=True)
+            self._compactor.start()
+
+    def _compact_safely(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.warning("⚠️ Compaction of %s failed: %s", self.name, e)
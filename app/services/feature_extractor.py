@@ -8,28 +8,289 @@ import numpy as np
 from PIL import Image
 from transformers import AutoImageProcessor, AutoModel, AutoTokenizer, AutoModelForSequenceClassification
 from rapidfuzz import fuzz
-from typing import Tuple, Optional
+from typing import Optional, List, Dict
+from app.config import settings
+from app.services.micro_batcher import MicroBatcher
+from app.services.image_cache import dino_input_cache
+from app.services.metrics import stage_errors, stage_timer
+from app.services.onnx_backend import create_onnx_session, onnx_model_path, DINO_ONNX_PATH, RERANKER_ONNX_PATH
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def cosine_similarity(emb1: np.ndarray, emb2: np.ndarray) -> float:
+    """Cosine similarity between two embedding vectors"""
+    emb1 = np.asarray(emb1, dtype=np.float32)
+    emb2 = np.asarray(emb2, dtype=np.float32)
+    denom = float(np.linalg.norm(emb1) * np.linalg.norm(emb2))
+    if denom == 0.0:
+        return 0.0
+    return float(np.dot(emb1, emb2) / denom)
+
 
 class FeatureExtractor:
-    def __init__(self):
+    DINO_MODEL = 'facebook/dinov2-base'
+    RERANKER_MODEL = 'BAAI/bge-reranker-v2-m3'
+    
+    # Scores used when a stage fails or has not run yet
+    NEUTRAL_SIFT = 0.0
+    NEUTRAL_TEXT = 0.5
+    
+    def __init__(self, backend: Optional[str] = None, precision: Optional[str] = None):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"🔧 Initializing Feature Extractor on {self.device}...")
+        self.backend = backend or settings.INFERENCE_BACKEND  # torch | onnx
+        self.precision = precision or settings.MODEL_PRECISION  # fp32 | bf16 | int8
+        if self.precision == "int8" and self.device != "cpu":
+            logger.warning("⚠️ int8 dynamic quantization is CPU-only; using fp32 on %s", self.device)
+            self.precision = "fp32"
+        if self.precision == "bf16" and self.backend == "onnx":
+            # Only fp32 and int8 graphs are exported; normalise before the
+            # precision reaches the model version and feature-store keys
+            logger.warning("⚠️ bf16 is not available with the onnx backend; using fp32")
+            self.precision = "fp32"
         
-        # DINOv2 for image embeddings
-        self.img_processor = AutoImageProcessor.from_pretrained('facebook/dinov2-base')
-        self.img_model = AutoModel.from_pretrained('facebook/dinov2-base').to(self.device).eval()
+        # Models are loaded on first use (see the properties below)
+        self._img_processor = None
+        self._img_model = None
+        self._tokenizer = None
+        self._reranker = None
+        self._text_tokenizer = None
+        self._text_encoder = None
+        self._image_model_loaded = False
+        self._reranker_loaded = False
+        self._text_encoder_loaded = False
+        self._load_lock = threading.Lock()
         
-        # BGE Reranker for text similarity
-        rerank_name = 'BAAI/bge-reranker-v2-m3'
-        self.tokenizer = AutoTokenizer.from_pretrained(rerank_name)
-        self.reranker = AutoModelForSequenceClassification.from_pretrained(rerank_name).to(self.device).eval()
+        # Coalesces single-image embedding calls from concurrent requests
+        self.dino_batcher = MicroBatcher(
+            self.extract_dino_embeddings,
+            max_batch_size=settings.DINO_BATCH_MAX_SIZE,
+            max_wait_ms=settings.DINO_BATCH_MAX_WAIT_MS,
+            name="dino-batcher"
+        )
         
         # SIFT for traditional CV features
         self.sift = cv2.SIFT_create()
+        self.bf_matcher = cv2.BFMatcher(cv2.NORM_L2)
+        self.flann_matcher = cv2.FlannBasedMatcher(
+            dict(algorithm=1, trees=5),  # FLANN_INDEX_KDTREE
+            dict(checks=50)
+        )
+    
+    def _load_image_model(self):
+        """Load DINOv2 once, thread-safe"""
+        with self._load_lock:
+            if self._image_model_loaded:
+                return
+            logger.info("🔧 Loading %s (%s, %s) on %s...", self.DINO_MODEL, self.backend, self.precision, self.device)
+            self._img_processor = AutoImageProcessor.from_pretrained(self.DINO_MODEL)
+            if self.backend == "onnx":
+                self._img_model = create_onnx_session(onnx_model_path(DINO_ONNX_PATH, self.precision))
+            else:
+                model = AutoModel.from_pretrained(self.DINO_MODEL).to(self.device).eval()
+                self._img_model = self._apply_precision(model)
+            self._image_model_loaded = True
+    
+    def _load_reranker(self):
+        """Load the BGE Reranker once, thread-safe"""
+        with self._load_lock:
+            if self._reranker_loaded:
+                return
+            logger.info("🔧 Loading %s (%s, %s) on %s...", self.RERANKER_MODEL, self.backend, self.precision, self.device)
+            self._tokenizer = AutoTokenizer.from_pretrained(self.RERANKER_MODEL)
+            if self.backend == "onnx":
+                self._reranker = create_onnx_session(onnx_model_path(RERANKER_ONNX_PATH, self.precision))
+            else:
+                model = AutoModelForSequenceClassification.from_pretrained(self.RERANKER_MODEL).to(self.device).eval()
+                self._reranker = self._apply_precision(model)
+            self._reranker_loaded = True
+    
+    def _load_text_encoder(self):
+        """Load the bi-encoder for text embeddings once, thread-safe"""
+        with self._load_lock:
+            if self._text_encoder_loaded:
+                return
+            name = settings.TEXT_EMBEDDING_MODEL
+            logger.info("🔧 Loading %s (%s) on %s...", name, self.precision, self.device)
+            self._text_tokenizer = AutoTokenizer.from_pretrained(name)
+            model = AutoModel.from_pretrained(name).to(self.device).eval()
+            self._text_encoder = self._apply_precision(model)
+            self._text_encoder_loaded = True
+    
+    def _apply_precision(self, model: torch.nn.Module) -> torch.nn.Module:
+        """
+        Convert a freshly loaded fp32 model to the configured precision
+        
+        bf16 halves weight memory; int8 dynamically quantizes every Linear
+        layer (weights int8, activations quantized per batch) on CPU.
+        """
+        if self.precision == "bf16":
+            return model.to(torch.bfloat16)
+        if self.precision == "int8":
+            return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+    
+    @property
+    def img_processor(self):
+        if not self._image_model_loaded:
+            self._load_image_model()
+        return self._img_processor
+    
+    @property
+    def img_model(self):
+        """DINOv2 torch module, or an ONNX Runtime session with the onnx backend"""
+        if not self._image_model_loaded:
+            self._load_image_model()
+        return self._img_model
+    
+    @property
+    def tokenizer(self):
+        if not self._reranker_loaded:
+            self._load_reranker()
+        return self._tokenizer
+    
+    @property
+    def reranker(self):
+        """Reranker torch module, or an ONNX Runtime session with the onnx backend"""
+        if not self._reranker_loaded:
+            self._load_reranker()
+        return self._reranker
+    
+    @property
+    def text_tokenizer(self):
+        if not self._text_encoder_loaded:
+            self._load_text_encoder()
+        return self._text_tokenizer
+    
+    @property
+    def text_encoder(self):
+        if not self._text_encoder_loaded:
+            self._load_text_encoder()
+        return self._text_encoder
+    
+    def loaded_models(self) -> Dict[str, bool]:
+        """Which models are in memory"""
+        return {
+            "dinov2": self._image_model_loaded,
+            "reranker": self._reranker_loaded,
+            "text_encoder": self._text_encoder_loaded
+        }
+    
+    def _dino_forward(self, pixel_values: torch.Tensor) -> np.ndarray:
+        """Run DINOv2 and return L2-normalised mean-pooled embeddings"""
+        img_model = self.img_model  # load outside the timer
+        with stage_timer("dino"):
+            if self.backend == "onnx":
+                return img_model.run(
+                    ["embedding"],
+                    {"pixel_values": pixel_values.cpu().numpy().astype(np.float32)}
+                )[0].astype(np.float32)
+            
+            dtype = torch.bfloat16 if self.precision == "bf16" else torch.float32
+            with torch.no_grad():
+                outputs = img_model(pixel_values=pixel_values.to(self.device, dtype=dtype)).last_hidden_state.mean(dim=1)
+                outputs = torch.nn.functional.normalize(outputs.float(), dim=1)
+            return outputs.float().cpu().numpy()
+    
+    def _reranker_forward(self, inputs) -> np.ndarray:
+        """Run the reranker on tokenized pairs and return raw logits"""
+        reranker = self.reranker  # load outside the timer
+        with stage_timer("reranker"):
+            if self.backend == "onnx":
+                return reranker.run(
+                    ["logits"],
+                    {
+                        "input_ids": inputs["input_ids"].cpu().numpy().astype(np.int64),
+                        "attention_mask": inputs["attention_mask"].cpu().numpy().astype(np.int64)
+                    }
+                )[0].reshape(-1).astype(np.float32)
+            
+            with torch.no_grad():
+                logits = reranker(**inputs.to(self.device)).logits.view(-1)
+            return logits.float().cpu().numpy()
+    
+    def warmup(self):
+        """Load all models ahead of the first request"""
+        self._load_image_model()
+        self._load_reranker()
+        self._load_text_encoder()
+    
+    def extract_dino_embeddings(self, images: List[Image.Image]) -> np.ndarray:
+        """
+        Compute L2-normalised DINOv2 embeddings (mean-pooled last hidden state)
+        
+        Returns:
+            Array of shape (len(images), hidden_size)
+        """
+        return self._dino_forward(self._dino_pixel_values(images))
+    
+    def _dino_pixel_values(self, images: List[Image.Image]) -> torch.Tensor:
+        """
+        Normalized DINOv2 inputs, reusing cached tensors for images loaded by
+        load_clean_image (they carry a cache key) when DINO_INPUT_CACHE_MB > 0
+        """
+        keys = [img.info.get("cache_key") for img in images]
+        if not dino_input_cache.enabled or not any(keys):
+            return self.img_processor(images=images, return_tensors="pt")["pixel_values"]
         
-       
-       
-       
+        tensors = [dino_input_cache.get(key) if key else None for key in keys]
+        missing = [i for i, tensor in enumerate(tensors) if tensor is None]
+        if missing:
+            computed = self.img_processor(images=[images[i] for i in missing], return_tensors="pt")["pixel_values"]
+            for i, tensor in zip(missing, computed):
+                tensors[i] = tensor
+                if keys[i]:
+                    dino_input_cache.put(keys[i], tensor)
+        return torch.stack(tensors)
+    
+    def extract_dino_embedding(self, img: Image.Image) -> np.ndarray:
+        """
+        Compute the DINOv2 embedding of a single image
+        
+        Goes through the shared micro-batcher so concurrent uploads and
+        searches share one forward pass.
+        """
+        if settings.DINO_BATCH_MAX_SIZE <= 1:
+            return self.extract_dino_embeddings([img])[0]
+        return self.dino_batcher(img)
+    
+    def extract_text_embeddings(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Compute L2-normalised bi-encoder embeddings (attention-masked mean pooling)
+        
+        Unlike the reranker these are computed once per item, so a search
+        can compare one query against every candidate with a matrix product.
+        
+        Returns:
+            Array of shape (len(texts), hidden_size)
+        """
+        prefix = settings.TEXT_EMBEDDING_PREFIX
+        text_tokenizer, text_encoder = self.text_tokenizer, self.text_encoder
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            inputs = text_tokenizer(
+                [prefix + text for text in texts[start:start + batch_size]],
+                padding=True,
+                truncation=True,
+                max_length=256,
+                return_tensors='pt'
+            ).to(self.device)
+            
+            with stage_timer("text_encoder"), torch.no_grad():
+                hidden = text_encoder(**inputs).last_hidden_state.float()
+                mask = inputs["attention_mask"].unsqueeze(-1).float()
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                outputs.append(torch.nn.functional.normalize(pooled, dim=1).cpu().numpy())
+        
+        if not outputs:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(outputs).astype(np.float32)
+    
+    def extract_text_embedding(self, text: str) -> np.ndarray:
+        """Compute the bi-encoder embedding of a single text"""
+        return self.extract_text_embeddings([text])[0]
     
     def extract_dino_features(self, img1: Image.Image, img2: Image.Image) -> float:
         """
@@ -39,23 +300,107 @@ class FeatureExtractor:
             Cosine similarity score (0.0 to 1.0)
         """
         try:
-            # Preprocess images
-            inputs = self.img_processor(images=[img1, img2], return_tensors="pt").to(self.device)
-            
-            # Extract features
-            with torch.no_grad():
-                outputs = self.img_model(**inputs).last_hidden_state.mean(dim=1)
-                feat1, feat2 = outputs[0], outputs[1]
-                
-                # Cosine similarity
-                similarity = torch.nn.functional.cosine_similarity(feat1.unsqueeze(0), feat2.unsqueeze(0))
-                
-            return float(similarity.cpu().numpy()[0])
+            feat1, feat2 = self.extract_dino_embeddings([img1, img2])
+            return cosine_similarity(feat1, feat2)
         
         except Exception as e:
-            print(f"DINOv2 extraction error: {e}")
+            logger.warning("DINOv2 extraction error: %s", e)
+            stage_errors.inc(stage="dino")
             return 0.5  # Default neutral score
     
+    def compute_sift_descriptors(self, img: Image.Image) -> Optional[np.ndarray]:
+        """
+        Detect SIFT keypoints and compute their descriptors
+        
+        Returns:
+            (num_keypoints, 128) float32 array, or None if nothing was detected
+        """
+        with stage_timer("sift_extract"):
+            cv_img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2GRAY)
+            _, descriptors = self.sift.detectAndCompute(cv_img, None)
+        return descriptors
+    
+    def match_sift_descriptors(self, des1: Optional[np.ndarray], des2: Optional[np.ndarray]) -> float:
+        """
+        Compute the SIFT matching score between two descriptor sets
+        
+        Returns:
+            SIFT match score (0.0 to 1.0)
+        """
+        if des1 is None or des2 is None or len(des1) == 0 or len(des2) < 2:
+            return 0.0
+        
+        des1 = np.asarray(des1, dtype=np.float32)
+        des2 = np.asarray(des2, dtype=np.float32)
+        
+        # Match keypoints using KNN (approximate for large descriptor sets)
+        if len(des2) >= settings.SIFT_FLANN_MIN_DESCRIPTORS:
+            matches = self.flann_matcher.knnMatch(des1, des2, k=2)
+        else:
+            matches = self.bf_matcher.knnMatch(des1, des2, k=2)
+        
+        # Apply Lowe's ratio test
+        good_matches = []
+        for match_pair in matches:
+            if len(match_pair) == 2:
+                m, n = match_pair
+                if m.distance < 0.75 * n.distance:
+                    good_matches.append(m)
+        
+        # Compute score relative to the query keypoint count
+        score = min((len(good_matches) / len(des1)) * 10, 1.0)
+        
+        return float(score)
+    
+    def match_sift_batch(
+        self,
+        query_des: Optional[np.ndarray],
+        candidate_des: List[Optional[np.ndarray]]
+    ) -> np.ndarray:
+        """
+        Score query SIFT descriptors against many candidates at once
+        
+        Brute-force L2 matching with Lowe's ratio test, computed as a few
+        large distance matrices instead of one matcher call per candidate.
+        Candidates are grouped so each block holds about SIFT_MATCH_CHUNK
+        descriptors.
+        
+        Returns:
+            Array of SIFT match scores (0.0 to 1.0)
+        """
+        scores = np.zeros(len(candidate_des), dtype=np.float64)
+        if query_des is None or len(query_des) == 0:
+            return scores
+        
+        with stage_timer("sift_match"):
+            self._match_sift_blocks(np.asarray(query_des, dtype=np.float32), candidate_des, scores)
+        return scores
+    
+    def _match_sift_blocks(self, query: np.ndarray, candidate_des: List[Optional[np.ndarray]], scores: np.ndarray):
+        """Fill scores in place, one distance matrix per SIFT_MATCH_CHUNK block"""
+        query_sq = np.einsum('ij,ij->i', query, query)[:, None]
+        valid = [i for i, des in enumerate(candidate_des) if des is not None and len(des) >= 2]
+        
+        pos = 0
+        while pos < len(valid):
+            group, total = [], 0
+            while pos < len(valid) and (not group or total + len(candidate_des[valid[pos]]) <= settings.SIFT_MATCH_CHUNK):
+                group.append(valid[pos])
+                total += len(candidate_des[valid[pos]])
+                pos += 1
+            
+            train = np.vstack([candidate_des[i] for i in group]).astype(np.float32)
+            train_sq = np.einsum('ij,ij->i', train, train)[None, :]
+            dist = np.sqrt(np.maximum(query_sq + train_sq - 2.0 * (query @ train.T), 0.0))
+            
+            offset = 0
+            for i in group:
+                size = len(candidate_des[i])
+                nearest = np.partition(dist[:, offset:offset + size], 1, axis=1)[:, :2]
+                good = np.count_nonzero(nearest[:, 0] < 0.75 * nearest[:, 1])
+                scores[i] = min((good / len(query)) * 10, 1.0)
+                offset += size
+    
     def extract_sift_features(self, img1: Image.Image, img2: Image.Image) -> float:
         """
         Extract SIFT keypoints and compute matching score
@@ -64,39 +409,14 @@ class FeatureExtractor:
             SIFT match score (0.0 to 1.0)
         """
         try:
-            # Convert to grayscale
-            cv_img1 = cv2.cvtColor(np.array(img1), cv2.COLOR_RGB2GRAY)
-            cv_img2 = cv2.cvtColor(np.array(img2), cv2.COLOR_RGB2GRAY)
-            
-            # Detect keypoints
-            kp1, des1 = self.sift.detectAndCompute(cv_img1, None)
-            kp2, des2 = self.sift.detectAndCompute(cv_img2, None)
-            
-            if des1 is None or des2 is None:
-                return 0.0
-            
-            # Match keypoints using KNN
-            bf = cv2.BFMatcher()
-            matches = bf.knnMatch(des1, des2, k=2)
-            
-            # Apply Lowe's ratio test
-            good_matches = []
-            for match_pair in matches:
-                if len(match_pair) == 2:
-                    m, n = match_pair
-                    if m.distance < 0.75 * n.distance:
-                        good_matches.append(m)
-            
-            # Compute score
-            if len(kp1) > 0:
-                score = min((len(good_matches) / len(kp1)) * 10, 1.0)
-            else:
-                score = 0.0
-            
-            return float(score)
+            return self.match_sift_descriptors(
+                self.compute_sift_descriptors(img1),
+                self.compute_sift_descriptors(img2)
+            )
         
         except Exception as e:
-            print(f"⚠️ SIFT extraction error: {e}")
+            logger.warning("⚠️ SIFT extraction error: %s", e)
+            stage_errors.inc(stage="sift")
             return 0.0
     
     def extract_text_similarity(self, text1: str, text2: str) -> float:
@@ -106,25 +426,52 @@ class FeatureExtractor:
         Returns:
             Text similarity score (0.0 to 1.0)
         """
-        try:
-            # Tokenize
-            inputs = self.tokenizer(
-                [(text1, text2)],
-                padding=True,
-                truncation=True,
-                return_tensors='pt'
-            ).to(self.device)
-            
-            # Get similarity score
-            with torch.no_grad():
-                logits = self.reranker(**inputs).logits.view(-1)
-                score = torch.sigmoid(logits)
+        return float(self.extract_text_similarity_batch(text1, [text2])[0])
+    
+    def extract_text_similarity_batch(
+        self,
+        query: str,
+        texts: List[str],
+        batch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Score one query text against many texts using BGE Reranker
+        
+        Pairs are sorted by length so each padded mini-batch holds texts of
+        similar length; scores are returned in input order.
+        
+        Args:
+            query: Query description
+            texts: Candidate descriptions
+            batch_size: Pairs per forward pass (default: RERANKER_BATCH_SIZE)
+        
+        Returns:
+            Array of similarity scores (0.0 to 1.0), 0.5 where scoring failed
+        """
+        batch_size = batch_size or settings.RERANKER_BATCH_SIZE
+        scores = np.full(len(texts), 0.5, dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            try:
+                # Tokenize
+                inputs = self.tokenizer(
+                    [(query, texts[i]) for i in batch],
+                    padding=True,
+                    truncation=True,
+                    return_tensors='pt'
+                )
+                
+                # Get similarity scores
+                logits = self._reranker_forward(inputs)
+                scores[batch] = 1.0 / (1.0 + np.exp(-logits))
             
-            return float(score.cpu().numpy()[0])
+            except Exception as e:
+                logger.warning("⚠️ Text similarity error: %s", e)
+                stage_errors.inc(stage="reranker")
         
-        except Exception as e:
-            print(f"⚠️ Text similarity error: {e}")
-            return 0.5
+        return scores
     
     def extract_item_name_similarity(self, item_name: str, description: str) -> float:
         """
@@ -165,23 +512,130 @@ class FeatureExtractor:
         img2: Image.Image,
         text1: str,
         text2: str,
-        item_name: str
+        item_name: str,
+        emb1: Optional[np.ndarray] = None,
+        emb2: Optional[np.ndarray] = None,
+        text_sim: Optional[float] = None
     ) -> np.ndarray:
         """
         Extract all features for a pair of items
         
+        If both stored DINOv2 embeddings are given, the visual similarity is
+        computed from them instead of running the model again. A text score
+        already computed in a batch can be passed as text_sim.
+        
         Returns:
             Feature vector: [dino_sim, sift_sim, text_sim, item_sim, color_match]
         """
-        dino_sim = self.extract_dino_features(img1, img2)
+        if emb1 is not None and emb2 is not None:
+            dino_sim = cosine_similarity(emb1, emb2)
+        else:
+            dino_sim = self.extract_dino_features(img1, img2)
         sift_sim = self.extract_sift_features(img1, img2)
-        text_sim = self.extract_text_similarity(text1, text2)
+        if text_sim is None:
+            text_sim = self.extract_text_similarity(text1, text2)
         item_sim = self.extract_item_name_similarity(item_name, text2)
         color_match = self.extract_color_match(text1, text2)
         
         features = np.array([dino_sim, sift_sim, text_sim, item_sim, color_match])
         
         return features
+    
+    def extract_cheap_features_batch(
+        self,
+        query_img: Optional[Image.Image],
+        candidate_imgs: List[Optional[Image.Image]],
+        query_text: str,
+        candidate_texts: List[str],
+        item_name: str,
+        query_emb: Optional[np.ndarray] = None,
+        candidate_embs: Optional[List[Optional[np.ndarray]]] = None
+    ) -> np.ndarray:
+        """
+        Stage 1 of the matching cascade: XGBoost features that cost almost nothing
+        
+        DINOv2 similarity comes from one matrix product over stored
+        embeddings; item name and color use RapidFuzz and keyword checks.
+        SIFT and text columns are set to the same neutral values the
+        pipeline uses when those stages fail (NEUTRAL_SIFT, NEUTRAL_TEXT).
+        
+        Returns:
+            Feature matrix of shape (N, 5), columns as in extract_all_features
+        """
+        n = len(candidate_texts)
+        features = np.zeros((n, 5), dtype=np.float64)
+        if n == 0:
+            return features
+        
+        features[:, 1] = self.NEUTRAL_SIFT
+        features[:, 2] = self.NEUTRAL_TEXT
+        
+        # DINOv2 (candidates without an embedding get the neutral 0.5)
+        features[:, 0] = 0.5
+        try:
+            if candidate_embs is None:
+                candidate_embs = list(self.extract_dino_embeddings(list(candidate_imgs)))
+            if query_emb is None:
+                query_emb = self.extract_dino_embedding(query_img)
+            rows = [i for i, emb in enumerate(candidate_embs) if emb is not None]
+            if rows:
+                # Stored vectors may be float16; score in float32
+                matrix = np.vstack([candidate_embs[i] for i in rows]).astype(np.float32)
+                query_emb = np.asarray(query_emb, dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_emb)
+                norms[norms == 0] = 1.0
+                features[rows, 0] = (matrix @ query_emb) / norms
+        except Exception as e:
+            logger.warning("DINOv2 extraction error: %s", e)
+            stage_errors.inc(stage="dino")
+        
+        # Item name, color
+        for i, text in enumerate(candidate_texts):
+            features[i, 3] = self.extract_item_name_similarity(item_name, text)
+            features[i, 4] = self.extract_color_match(query_text, text)
+        
+        return features
+    
+    def add_expensive_features_batch(
+        self,
+        features: np.ndarray,
+        query_img: Optional[Image.Image],
+        candidate_imgs: List[Optional[Image.Image]],
+        query_text: str,
+        candidate_texts: List[str],
+        query_des: Optional[np.ndarray] = None,
+        candidate_des: Optional[List[Optional[np.ndarray]]] = None
+    ) -> np.ndarray:
+        """
+        Stage 2 of the matching cascade: fill in SIFT and reranker scores
+        
+        Args:
+            features: Stage 1 matrix (N, 5); columns 1 and 2 are overwritten
+            query_des: Cached query SIFT descriptors (optional)
+            candidate_des: Cached candidate SIFT descriptors (optional)
+        
+        Returns:
+            The completed feature matrix
+        """
+        if len(candidate_texts) == 0:
+            return features
+        
+        # SIFT
+        features[:, 1] = self.NEUTRAL_SIFT
+        try:
+            if query_des is None:
+                query_des = self.compute_sift_descriptors(query_img)
+            if candidate_des is None:
+                candidate_des = [self.compute_sift_descriptors(img) for img in candidate_imgs]
+            features[:, 1] = self.match_sift_batch(query_des, candidate_des)
+        except Exception as e:
+            logger.warning("⚠️ SIFT extraction error: %s", e)
+            stage_errors.inc(stage="sift")
+        
+        # Text
+        features[:, 2] = self.extract_text_similarity_batch(query_text, candidate_texts)
+        
+        return features
 
 # Singleton instance
 feature_extractor = FeatureExtractor()
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Feature Store - Compact binary storage of per-item embeddings
+One item_features row per (item, kind, model), the vector kept as raw bytes
+"""
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.core.database import upsert
+from app.models.database_models import ItemFeature
+from app.services.feature_extractor import FeatureExtractor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+
+class FeatureStore:
+    """
+    Embeddings live in their own table instead of columns on Item, so item
+    queries (tracking, candidate lists) never carry vector bytes. Rows are
+    versioned by model name: switching models leaves the old vectors in
+    place and the new ones are backfilled next to them.
+
+    Vectors come back as read-only np.frombuffer views over the row bytes,
+    in the stored dtype; there is no text decoding step.
+
+    Writes are one dialect upsert per batch: two workers backfilling the
+    same item at once (an upload job and a search) both succeed instead
+    of one failing on the unique key. Sessions run with autoflush=False,
+    so reads and writes flush pending ORM changes first.
+    """
+
+    def __init__(self, dtype: str = settings.FEATURE_STORE_DTYPE):
+        self.dtype = np.dtype(dtype)
+
+    @staticmethod
+    def model_name(kind: str) -> str:
+        """Model that produces the embeddings of a kind ("dino" or "text")"""
+        if kind == "dino":
+            return FeatureExtractor.DINO_MODEL
+        if kind == "text":
+            return settings.TEXT_EMBEDDING_MODEL
+        raise ValueError(f"Unknown feature kind: {kind}")
+
+    @staticmethod
+    def _decode(dtype: str, data: bytes) -> np.ndarray:
+        return np.frombuffer(data, dtype=np.dtype(dtype))
+
+    def get(self, db: Session, item_id: int, kind: str) -> Optional[np.ndarray]:
+        """Stored vector of one item, or None"""
+        return self.get_many(db, [item_id], kind).get(item_id)
+
+    def get_many(self, db: Session, item_ids: List[int], kind: str) -> Dict[int, np.ndarray]:
+        """
+        Stored vectors of several items for the current model
+
+        Returns:
+            {item_id: vector} for the items that have one
+        """
+        if not item_ids:
+            return {}
+        db.flush()
+        rows = db.query(ItemFeature.item_id, ItemFeature.dtype, ItemFeature.vector).filter(
+            ItemFeature.item_id.in_(list(item_ids)),
+            ItemFeature.kind == kind,
+            ItemFeature.model_name == self.model_name(kind)
+        )
+        return {item_id: self._decode(dtype, data) for item_id, dtype, data in rows}
+
+    def get_matrix(self, db: Session, item_ids: List[int], kind: str) -> Tuple[List[int], np.ndarray]:
+        """
+        Stored vectors stacked into one float32 matrix
+
+        Returns:
+            (ids that have a vector, matrix with one row per id)
+        """
+        vectors = self.get_many(db, item_ids, kind)
+        ids = [item_id for item_id in item_ids if item_id in vectors]
+        if not ids:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        matrix = np.empty((len(ids), len(vectors[ids[0]])), dtype=np.float32)
+        for row, item_id in enumerate(ids):
+            matrix[row] = vectors[item_id]
+        return ids, matrix
+
+    def put(self, db: Session, item_id: int, kind: str, vector: np.ndarray):
+        """Insert or replace the vector of one item (committed by the caller)"""
+        self.put_many(db, [item_id], kind, [vector])
+
+    def put_many(self, db: Session, item_ids: List[int], kind: str, vectors):
+        """Insert or replace the vectors of several items (committed by the caller)"""
+        if len(item_ids) == 0:
+            return
+        model_name = self.model_name(kind)
+        rows = []
+        for item_id, vector in zip(item_ids, vectors):
+            vector = np.asarray(vector, dtype=self.dtype).reshape(-1)
+            rows.append({
+                "item_id": int(item_id),
+                "kind": kind,
+                "model_name": model_name,
+                "dtype": self.dtype.name,
+                "dim": len(vector),
+                "vector": vector.tobytes()
+            })
+        db.flush()
+        upsert(db, ItemFeature, rows, ["item_id", "kind", "model_name"])
+
+
+# Singleton instance
+feature_store = FeatureStore()
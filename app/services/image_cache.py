@@ -0,0 +1,96 @@
+"""
+Image Cache - Memory-bounded LRU caches for decoded images and model inputs
+"""
+from app.config import settings
+from app.services.metrics import metrics
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import threading
+
+
+class LRUCache:
+    """
+    Least-recently-used cache with a byte budget instead of an entry count
+
+    `sizeof` gives the size of a value in bytes; the oldest entries are
+    evicted until the total fits in `max_mb`. A budget of 0 disables the
+    cache (get always misses, put is a no-op).
+    """
+
+    def __init__(self, max_mb: float, sizeof: Callable[[Any], int], name: str = "cache"):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.sizeof = sizeof
+        self.name = name
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        size = self.sizeof(value)
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._sizes[key]
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                old_key, _ = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(old_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "mb": round(self._bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self._hits,
+                "misses": self._misses
+            }
+
+
+# Decoded IMAGE_SIZE RGB arrays, keyed by (image_path, mtime_ns)
+image_cache = LRUCache(settings.IMAGE_CACHE_MB, lambda array: array.nbytes, name="images")
+
+# Normalized DINOv2 pixel tensors, keyed like image_cache (off by default)
+dino_input_cache = LRUCache(
+    settings.DINO_INPUT_CACHE_MB,
+    lambda tensor: tensor.element_size() * tensor.nelement(),
+    name="dino_inputs"
+)
+
+
+def _cache_samples(field: str) -> Callable[[], Dict[Tuple[str, ...], float]]:
+    return lambda: {(cache.name,): cache.stats()[field] for cache in (image_cache, dino_input_cache)}
+
+
+metrics.gauge("lostfound_cache_entries", "Entries held by an LRU cache", ["cache"], _cache_samples("entries"))
+metrics.gauge("lostfound_cache_mb", "Megabytes held by an LRU cache", ["cache"], _cache_samples("mb"))
+metrics.gauge("lostfound_cache_max_mb", "Byte budget of an LRU cache in megabytes", ["cache"], _cache_samples("max_mb"))
+metrics.gauge("lostfound_cache_hits_total", "LRU cache lookups that hit", ["cache"], _cache_samples("hits"), kind="counter")
+metrics.gauge("lostfound_cache_misses_total", "LRU cache lookups that missed", ["cache"], _cache_samples("misses"), kind="counter")
@@ -1,29 +1,127 @@
 """
 Image Processor - Handle image upload, background removal, and preprocessing
 """
-from PIL import Image
+from PIL import Image, ImageOps
 from app.config import settings
-from rembg import remove, new_session
+from app.services.inference_executor import inference_executor
+from app.services.image_cache import image_cache
+from app.services.metrics import stage_timer
 from fastapi import UploadFile, HTTPException
 import uuid
 from pathlib import Path
 from typing import Optional, cast
+import numpy as np
+import threading
+import logging
+import os
 import io  
 
-# Initialize rembg session (GPU if available)
-try:
-    rembg_session = new_session(providers=['CUDAExecutionProvider'])
-except:
-    rembg_session = new_session()
+logger = logging.getLogger(__name__)
+
+# rembg session (GPU if available), created on first use
+_rembg_session = None
+_rembg_lock = threading.Lock()
+
+
+# Square input side of the rembg models (the session resizes to it)
+REMBG_INPUT_SIZES = {"u2net": 320, "u2netp": 320, "u2net_human_seg": 320, "silueta": 320}
+REMBG_DEFAULT_INPUT_SIZE = 1024  # isnet-*, birefnet-*, bria-rmbg
+
+
+def create_rembg_session(model_name: str = settings.REMBG_MODEL):
+    """
+    Open a rembg session for REMBG_MODEL with the configured ORT threading
+    
+    Builds the session class directly (rather than rembg.new_session) so
+    the thread counts come from Settings instead of OMP_NUM_THREADS.
+    """
+    # rembg pulls in onnxruntime and numba-compiled pymatting; import lazily
+    import onnxruntime as ort
+    from rembg.sessions import sessions
+    
+    if model_name not in sessions:
+        raise ValueError(f"Unknown REMBG_MODEL '{model_name}'. Available: {sorted(sessions)}")
+    
+    options = ort.SessionOptions()
+    if settings.REMBG_INTRA_OP_THREADS > 0:
+        options.intra_op_num_threads = settings.REMBG_INTRA_OP_THREADS
+    if settings.REMBG_INTER_OP_THREADS > 0:
+        options.inter_op_num_threads = settings.REMBG_INTER_OP_THREADS
+    
+    providers = ['CPUExecutionProvider']
+    if 'CUDAExecutionProvider' in ort.get_available_providers():
+        providers.insert(0, 'CUDAExecutionProvider')
+    return sessions[model_name](model_name, options, providers=providers)
+
+
+def get_rembg_session():
+    """Create the rembg session once, thread-safe"""
+    global _rembg_session
+    if _rembg_session is None:
+        with _rembg_lock:
+            if _rembg_session is None:
+                _rembg_session = create_rembg_session()
+    return _rembg_session
+
+
+def rembg_loaded() -> bool:
+    return _rembg_session is not None
 
 
 
 # Constants
 upload_path_str = cast(str, settings.UPLOAD_DIR)
 UPLOAD_DIR = Path(upload_path_str)
-MAX_FILE_SIZE_MB = 10
-ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+MAX_FILE_SIZE_MB = settings.MAX_IMAGE_SIZE_MB
 IMAGE_SIZE = (448, 448)
+# Derived features are a cache, not content: keep them out of ./static
+SIFT_DIR = Path(settings.MODEL_DIR) / "sift"
+
+# Leading bytes of the accepted formats -> saved file extension
+IMAGE_SIGNATURES = {
+    b'\xff\xd8\xff': '.jpg',
+    b'\x89PNG\r\n\x1a\n': '.png',
+}
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """
+    File extension for the image format in the first bytes of an upload
+    
+    Returns:
+        '.jpg', '.png' or '.webp', or None for anything else
+    """
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return '.webp'
+    for signature, ext in IMAGE_SIGNATURES.items():
+        if header.startswith(signature):
+            return ext
+    return None
+
+
+async def read_upload(file: UploadFile, max_bytes: int) -> bytearray:
+    """
+    Read an upload in UPLOAD_CHUNK_KB chunks, giving up past max_bytes
+    
+    Raises:
+        HTTPException: 413 if the file is larger than max_bytes
+    """
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"File too large. Max size: {MAX_FILE_SIZE_MB:g}MB"
+    )
+    if file.size is not None and file.size > max_bytes:
+        raise too_large
+    
+    chunk_size = max(1, settings.UPLOAD_CHUNK_KB) * 1024
+    contents = bytearray()
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return contents
+        if len(contents) + len(chunk) > max_bytes:
+            raise too_large
+        contents += chunk
 
 
 
@@ -35,72 +133,44 @@ async def process_and_save_image(
     tracking_token: str
 ) -> str:
     
-    # Validate file extension
-    safe_filename = file.filename if file.filename else "unknown.jpg"
-    file_ext = Path(safe_filename).suffix.lower()
+    # Read in chunks, stopping as soon as the size limit is passed
+    contents = await read_upload(file, int(MAX_FILE_SIZE_MB * 1024 * 1024))
     
-    if file_ext not in ALLOWED_EXTENSIONS:
+    # Validate the format from the file header, not the client's extension
+    file_ext = sniff_image_type(bytes(contents[:12]))
+    if file_ext is None:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid file type. Allowed: {ALLOWED_EXTENSIONS}"
+            detail="Invalid file type. Allowed: JPEG, PNG, WebP"
         )
     
-    # Read file
-    contents = await file.read()
-    
-    # Check file size
-    size_mb = len(contents) / (1024 * 1024)
-    if size_mb > MAX_FILE_SIZE_MB:
+    # Reject decompression bombs before anything decodes the pixels
+    try:
+        width, height = Image.open(io.BytesIO(contents)).size
+    except Exception:
+        raise HTTPException(status_code=400, detail="Unreadable image file")
+    if width * height > settings.MAX_IMAGE_MEGAPIXELS * 1_000_000:
         raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Max size: {MAX_FILE_SIZE_MB}MB"
+            status_code=413,
+            detail=f"Image too large. Max {settings.MAX_IMAGE_MEGAPIXELS:g} megapixels"
         )
     
+    # Generate filename
+    filename = f"{tracking_token}_{uuid.uuid4().hex[:8]}{file_ext}"
     
+    # Create directory if not exists
+    save_dir = UPLOAD_DIR / item_type
+    save_dir.mkdir(parents=True, exist_ok=True)
     
     try:
-        # Open image
-        img = Image.open(io.BytesIO(contents))
-        
-        
-        # Remove background
-        img_no_bg_raw = remove(img, session=rembg_session)
-           
-        
-        if not isinstance(img_no_bg_raw, Image.Image):
-            
-            img_no_bg = Image.open(io.BytesIO(img_no_bg_raw)).convert("RGBA")
-        else:
-            img_no_bg = img_no_bg_raw
-            
-        
-        img_final = Image.new("RGB", img_no_bg.size, (255, 255, 255))
-        
-        if img_no_bg.mode == 'RGBA':
-            img_final.paste(img_no_bg, mask=img_no_bg.split()[3])
-        else:
-            img_final.paste(img_no_bg)
-        
-        # Resize
-        img_final = img_final.resize(IMAGE_SIZE, Image.Resampling.LANCZOS)
-        
-        
-        # Generate filename
-        filename = f"{tracking_token}_{uuid.uuid4().hex[:8]}{file_ext}"
-        
-        # Create directory if not exists
-        save_dir = UPLOAD_DIR / item_type
-        save_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Save path
-        file_path = save_dir / filename
-        
-        # Save image
-        img_final.save(file_path, quality=95, optimize=True)
+        # Background removal is CPU-bound; keep it off the event loop
+        await inference_executor.run(clean_and_save_image, contents, str(save_dir / filename))
         
         # Return relative path
         return f"uploads/{item_type}/{filename}"
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -108,33 +178,200 @@ async def process_and_save_image(
         )
 
 
+def delete_saved_image(image_path: str):
+    """Remove a saved upload whose submission failed after the image was written"""
+    try:
+        (Path("static") / image_path).unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning("Could not delete orphaned upload %s: %s", image_path, e)
+
+
+def clean_and_save_image(contents: bytes, file_path: str):
+    """
+    Remove the background, flatten onto white, resize and save
+    
+    JPEGs are decoded in draft mode: libjpeg scales by 1/2, 1/4 or 1/8
+    while decoding, to the smallest size that still covers IMAGE_SIZE, so
+    a large photo never exists in memory at full resolution.
+    
+    Args:
+        contents: Raw uploaded image bytes
+        file_path: Destination path
+    """
+    # Open image
+    img = Image.open(io.BytesIO(contents))
+    if img.format == "JPEG":
+        img.draft("RGB", IMAGE_SIZE)
+    
+    # Apply the camera's EXIF orientation before either segmentation path
+    img = ImageOps.exif_transpose(img)
+    
+    # Remove background
+    if settings.REMBG_DOWNSCALE:
+        img_final = remove_background_downscaled(img)
+    else:
+        img_final = remove_background(img)
+    
+    # Resize
+    img_final = img_final.resize(IMAGE_SIZE, Image.Resampling.LANCZOS)
+    
+    # Save image
+    img_final.save(file_path, quality=95, optimize=True)
+
+
+def remove_background(img: Image.Image) -> Image.Image:
+    """Segment the image at full resolution and flatten it onto white"""
+    from rembg import remove
+    session = get_rembg_session()
+    with stage_timer("rembg"):
+        img_no_bg_raw = remove(img, session=session)
+    
+    if not isinstance(img_no_bg_raw, Image.Image):
+        img_no_bg = Image.open(io.BytesIO(img_no_bg_raw)).convert("RGBA")
+    else:
+        img_no_bg = img_no_bg_raw
+    
+    img_final = Image.new("RGB", img_no_bg.size, (255, 255, 255))
+    
+    if img_no_bg.mode == 'RGBA':
+        img_final.paste(img_no_bg, mask=img_no_bg.split()[3])
+    else:
+        img_final.paste(img_no_bg)
+    return img_final
+
+
+def remove_background_downscaled(img: Image.Image) -> Image.Image:
+    """
+    Segment a working-size copy and apply the upsampled mask
+    
+    The segmentation model only sees its own input size (320 px for the
+    u2net family), so the full-resolution upload is never run through
+    rembg. The photo itself is first reduced to the smallest size that
+    still covers IMAGE_SIZE; the mask is predicted on a copy whose longest
+    side is REMBG_WORKING_SIZE (default: the model input size) and
+    upsampled back to it.
+    
+    Returns:
+        RGB image on white, at least IMAGE_SIZE in both dimensions
+    """
+    from rembg import remove
+    
+    img = img.convert("RGB")
+    scale = max(IMAGE_SIZE[0] / img.width, IMAGE_SIZE[1] / img.height)
+    if scale < 1:
+        img = img.resize((round(img.width * scale), round(img.height * scale)), Image.Resampling.LANCZOS)
+    
+    working_size = settings.REMBG_WORKING_SIZE or REMBG_INPUT_SIZES.get(settings.REMBG_MODEL, REMBG_DEFAULT_INPUT_SIZE)
+    segment_img = img
+    if max(img.size) > working_size:
+        segment_img = img.copy()
+        segment_img.thumbnail((working_size, working_size), Image.Resampling.BILINEAR)
+    
+    session = get_rembg_session()
+    with stage_timer("rembg"):
+        mask = remove(segment_img, session=session, only_mask=True)
+    if not isinstance(mask, Image.Image):
+        mask = Image.open(io.BytesIO(mask))
+    mask = mask.convert("L").resize(img.size, Image.Resampling.BILINEAR)
+    
+    img_final = Image.new("RGB", img.size, (255, 255, 255))
+    img_final.paste(img, mask=mask)
+    return img_final
+
+
 def load_clean_image(image_path: str) -> Optional[Image.Image]:
     """
     Load a preprocessed image from disk
     
+    Decoded images are kept in an LRU cache keyed by path and mtime, so
+    repeated searches over the same inventory skip the decode and resize.
+    The returned image carries that key in img.info["cache_key"].
+    
     Args:
         image_path: Relative path to image
     
     Returns:
         PIL Image or None if failed
     """
+    full_path = Path("static") / image_path
     try:
-        full_path = Path("static") / image_path
-        
-        if not full_path.exists():
-            print(f"Image not found: {full_path}")
-            return None
-        
-        img = Image.open(full_path).convert("RGB")
-        
-        # Ensure standard size
-        if img.size != IMAGE_SIZE:
-            img = img.resize(IMAGE_SIZE, Image.Resampling.LANCZOS)
+        key = (image_path, os.stat(full_path).st_mtime_ns)
+    except FileNotFoundError:
+        logger.warning("Image not found: %s", full_path)
+        return None
+    
+    try:
+        pixels = image_cache.get(key)
+        if pixels is None:
+            img = Image.open(full_path).convert("RGB")
+            
+            # Ensure standard size
+            if img.size != IMAGE_SIZE:
+                img = img.resize(IMAGE_SIZE, Image.Resampling.LANCZOS)
+            
+            pixels = np.asarray(img)
+            pixels.flags.writeable = False
+            image_cache.put(key, pixels)
         
+        img = Image.fromarray(pixels)
+        img.info["cache_key"] = key
         return img
     
     except Exception as e:
-        print(f"Failed to load image {image_path}: {e}")
+        logger.warning("Failed to load image %s: %s", image_path, e)
+        return None
+
+
+def sift_sidecar_path(item_id: int) -> Path:
+    """Path of an item's cached SIFT descriptors (outside the served static tree)"""
+    return SIFT_DIR / f"{item_id}.npz"
+
+
+def save_sift_descriptors(item_id: int, image_path: str, descriptors: Optional[np.ndarray]) -> int:
+    """
+    Store an item's SIFT descriptors as a uint8 .npz sidecar under MODEL_DIR/sift
+    
+    SIFT descriptor values already lie in 0..255, so uint8 is a quarter of
+    the float32 size at no loss in matching quality. The image path is
+    stored alongside, so a sidecar left behind under a reused item id
+    (after a DB reset or restore) is never served for another item.
+    
+    Returns:
+        Number of keypoints stored
+    """
+    if descriptors is None:
+        descriptors = np.empty((0, 128), dtype=np.float32)
+    
+    quantized = np.clip(np.rint(descriptors), 0, 255).astype(np.uint8)
+    SIFT_DIR.mkdir(parents=True, exist_ok=True)
+    np.savez(sift_sidecar_path(item_id), descriptors=quantized, image_path=np.array(image_path))
+    return len(quantized)
+
+
+def load_sift_descriptors(item_id: int, image_path: str) -> Optional[np.ndarray]:
+    """
+    Load an item's cached SIFT descriptors
+    
+    Returns:
+        (num_keypoints, 128) float32 array, or None if not cached yet or
+        cached for a different image
+    """
+    path = sift_sidecar_path(item_id)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as data:
+            if str(data["image_path"]) != image_path:
+                return None
+            return data["descriptors"].astype(np.float32)
+    except Exception as e:
+        logger.warning("Failed to load SIFT descriptors %s: %s", path, e)
         return None
 
 
+def delete_sift_descriptors(item_id: int):
+    """Remove the cached SIFT descriptors of a deleted item"""
+    try:
+        sift_sidecar_path(item_id).unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning("Could not delete SIFT descriptors of item %s: %s", item_id, e)
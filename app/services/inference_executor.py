@@ -0,0 +1,117 @@
+"""
+Inference Executor - Run CPU-bound model work off the asyncio event loop
+Bounded thread or process pool with a queue-depth limit and backpressure
+"""
+from fastapi import HTTPException
+from app.config import settings
+from app.services.metrics import metrics
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import functools
+
+
+class ExecutorSaturatedError(HTTPException):
+    """Raised when the inference queue is full; served as 429"""
+
+    def __init__(self, detail: str = "Server is busy, please retry shortly"):
+        super().__init__(status_code=429, detail=detail, headers={"Retry-After": "5"})
+
+
+class InferenceExecutor:
+    """
+    Runs rembg, DINOv2, SIFT, reranker and XGBoost calls in a worker pool
+
+    Torch, ONNX Runtime and OpenCV release the GIL, so the default thread
+    pool gives real parallelism while /health and /track keep answering.
+    Process mode needs top-level functions with picklable arguments, and
+    every worker process loads its own copy of the models.
+
+    At most `max_workers` jobs run at once and `max_queue` more may wait;
+    beyond that `run` raises ExecutorSaturatedError unless `wait=True`.
+    """
+
+    def __init__(
+        self,
+        mode: str = settings.INFERENCE_EXECUTOR,
+        max_workers: int = settings.INFERENCE_WORKERS,
+        max_queue: int = settings.INFERENCE_QUEUE_LIMIT
+    ):
+        self.mode = mode
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._active = 0
+        self._queued = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="inference"
+                )
+        return self._executor
+
+    async def run(self, fn: Callable, *args, wait: bool = False, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) in the pool and await its result
+
+        Args:
+            fn: Function to run (top-level if mode is "process")
+            wait: Queue even when saturated instead of raising (background jobs)
+        """
+        if not wait and self._active + self._queued >= self.max_workers + self.max_queue:
+            raise ExecutorSaturatedError()
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        self._queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+
+        self._active += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(),
+                functools.partial(fn, *args, **kwargs)
+            )
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict:
+        """Current load of the pool"""
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queued": self._queued
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Singleton instance
+inference_executor = InferenceExecutor()
+
+
+def _executor_samples(field: str) -> Callable[[], Dict]:
+    return lambda: {(inference_executor.mode,): inference_executor.stats()[field]}
+
+
+metrics.gauge("lostfound_inference_active", "Inference jobs running", ["mode"], _executor_samples("active"))
+metrics.gauge("lostfound_inference_queued", "Inference jobs waiting for a worker", ["mode"], _executor_samples("queued"))
+metrics.gauge("lostfound_inference_max_workers", "Inference pool size", ["mode"], _executor_samples("max_workers"))
+metrics.gauge("lostfound_inference_max_queue", "Inference jobs allowed to wait before 429", ["mode"], _executor_samples("max_queue"))
@@ -0,0 +1,171 @@
+"""
+Match Queue - Background matching jobs triggered by uploads
+In-process asyncio worker pool with an optional SQLite-backed durable queue
+"""
+from app.config import settings
+from app.services.matching_service import run_matching_job
+from app.services.inference_executor import inference_executor
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteJobStore:
+    """Durable job records so queued work survives a restart"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS match_jobs (
+                    tracking_token TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    enqueued_at REAL,
+                    started_at REAL,
+                    finished_at REAL,
+                    candidates INTEGER,
+                    error TEXT
+                )
+                """
+            )
+
+    def save(self, job: Dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO match_jobs
+                (tracking_token, status, enqueued_at, started_at, finished_at, candidates, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job["tracking_token"], job["status"], job.get("enqueued_at"),
+                    job.get("started_at"), job.get("finished_at"),
+                    job.get("candidates"), job.get("error")
+                )
+            )
+
+    def get(self, tracking_token: str) -> Optional[Dict]:
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT tracking_token, status, enqueued_at, started_at, finished_at, candidates, error "
+                "FROM match_jobs WHERE tracking_token = ?",
+                (tracking_token,)
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        keys = ("tracking_token", "status", "enqueued_at", "started_at", "finished_at", "candidates", "error")
+        return dict(zip(keys, row))
+
+    def pending(self) -> List[str]:
+        """Tokens of jobs that were queued or interrupted while running"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT tracking_token FROM match_jobs "
+                "WHERE status IN ('queued', 'running') ORDER BY enqueued_at"
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class MatchJobQueue:
+    """
+    Runs matching for newly uploaded items in the background
+
+    Job status per tracking token: queued -> running -> done | failed.
+    """
+
+    def __init__(self, workers: int = settings.MATCH_QUEUE_WORKERS, db_path: str = settings.MATCH_QUEUE_DB):
+        self.workers = workers
+        self._store = SQLiteJobStore(db_path) if db_path else None
+        self._jobs: Dict[str, Dict] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """Start the worker pool and resume jobs left in the durable store"""
+        if self.running or self.workers <= 0:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        if self._store:
+            for token in self._store.pending():
+                self.enqueue(token)
+            logger.info("Match queue started with %d workers, %d jobs resumed", self.workers, self._queue.qsize())
+
+    async def stop(self):
+        """Cancel the workers; unfinished durable jobs resume on next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, tracking_token: str) -> Optional[Dict]:
+        """
+        Queue a matching job for an item
+
+        Returns:
+            Job status, or None if the queue is not running
+        """
+        if not self.running:
+            return None
+
+        job = self._jobs.get(tracking_token)
+        if job and job["status"] == "queued":
+            return job
+
+        job = {
+            "tracking_token": tracking_token,
+            "status": "queued",
+            "enqueued_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "candidates": None,
+            "error": None
+        }
+        self._update(job)
+        self._queue.put_nowait(tracking_token)
+        return job
+
+    def get_status(self, tracking_token: str) -> Optional[Dict]:
+        """Current job status for a tracking token, if a job exists"""
+        job = self._jobs.get(tracking_token)
+        if job is None and self._store:
+            job = self._store.get(tracking_token)
+        return job
+
+    def _update(self, job: Dict):
+        self._jobs[job["tracking_token"]] = job
+        if self._store:
+            self._store.save(job)
+
+    async def _worker(self):
+        while True:
+            token = await self._queue.get()
+            job = dict(self._jobs[token], status="running", started_at=time.time())
+            self._update(job)
+            try:
+                candidates = await inference_executor.run(run_matching_job, token, wait=True)
+                job = dict(job, status="done", candidates=candidates)
+            except Exception as e:
+                logger.warning("⚠️ Matching job failed for %s: %s", token, e)
+                job = dict(job, status="failed", error=str(e))
+            finally:
+                job["finished_at"] = time.time()
+                self._update(job)
+                self._queue.task_done()
+
+
+# Singleton instance
+match_queue = MatchJobQueue()
@@ -0,0 +1,929 @@
+"""
+Matching Service - Candidate retrieval, feature extraction and ML scoring
+Shared by the search route and the background matching workers
+"""
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session, load_only
+from app.config import settings
+from app.core.database import SessionLocal, upsert
+from app.models.database_models import Item, Match, ItemType, SearchWatermark
+from app.services.ml_service import ml_service
+from app.services.feature_extractor import feature_extractor
+from app.services.feature_store import feature_store
+from app.services.image_processor import (
+    load_clean_image, load_sift_descriptors, save_sift_descriptors, delete_sift_descriptors
+)
+from app.services.vector_index import VectorIndex, get_vector_index
+from app.services.metrics import search_candidates, search_seconds, stage_timer
+from typing import Callable, List, Dict, Optional, Tuple
+from PIL import Image
+import numpy as np
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Item columns the search path reads; nothing else is loaded for candidates
+CANDIDATE_COLUMNS = (
+    Item.id, Item.tracking_token, Item.item_type, Item.item_name,
+    Item.description, Item.image_path, Item.contact_info
+)
+
+
+def candidate_query(db: Session, *extra_columns):
+    """Item query that loads only CANDIDATE_COLUMNS (plus extra_columns)"""
+    return db.query(Item).options(load_only(*CANDIDATE_COLUMNS, *extra_columns))
+
+
+class SearchCancelled(Exception):
+    """Raised inside a search when its cancel event is set (client went away)"""
+
+
+def item_summary(item: Item) -> Dict:
+    """Public fields of the query item returned with search results"""
+    return {
+        "id": item.id,
+        "token": item.tracking_token,
+        "type": item.item_type.value,
+        "name": item.item_name,
+        "description": item.description
+    }
+
+
+def format_match(candidate: Item, features, is_match: int, confidence: float) -> Dict:
+    """
+    Build the API representation of one scored candidate
+    
+    Args:
+        candidate: Matched item
+        features: [dino_sim, sift_sim, text_sim, item_sim, color_match]
+        is_match: ML prediction (0 or 1)
+        confidence: Match probability (0.0 to 1.0)
+    """
+    return {
+        "candidate_id": candidate.id,
+        "candidate_token": candidate.tracking_token,
+        "item_name": candidate.item_name,
+        "description": candidate.description,
+        "image_url": f"/static/{candidate.image_path}",
+        "contact_info": candidate.contact_info,
+        "is_match": bool(is_match),
+        "confidence": round(confidence * 100, 2),
+        "similarity_breakdown": {
+            "visual_similarity": round(float(features[0]) * 100, 2),
+            "texture_similarity": round(float(features[1]) * 100, 2),
+            "description_similarity": round(float(features[2]) * 100, 2),
+            "name_similarity": round(float(features[3]) * 100, 2),
+            "color_match": "Yes" if features[4] > 0.7 else "No"
+        }
+    }
+
+
+def current_model_version() -> str:
+    """
+    Version tag stored on Match rows
+    
+    Changes whenever anything that produces the scores changes: the XGBoost
+    model or its threshold, the feature models, the backend or precision.
+    """
+    ml_service.ensure_loaded()
+    parts = [
+        ml_service.model_hash,
+        feature_extractor.DINO_MODEL,
+        feature_extractor.RERANKER_MODEL,
+        feature_extractor.backend,
+        feature_extractor.precision
+    ]
+    return hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:16]
+
+
+def match_columns(query_item: Item):
+    """(column holding the query item's id, column holding the candidate's id)"""
+    if query_item.item_type == ItemType.LOST:
+        return Match.lost_item_id, Match.found_item_id
+    return Match.found_item_id, Match.lost_item_id
+
+
+def match_features(match: Match) -> np.ndarray:
+    """Stored feature vector of a Match row, in extractor order"""
+    return np.array([
+        match.dino_similarity, match.sift_similarity, match.text_similarity,
+        match.item_name_similarity, match.color_match
+    ], dtype=np.float32)
+
+
+def load_match_memo(db: Session, query_item: Item, candidate_ids: List[int], model_version: str) -> Dict[int, Match]:
+    """
+    Match rows already stored for this query item and model version
+    
+    Returns:
+        {candidate_id: Match}
+    """
+    if not candidate_ids:
+        return {}
+    own_column, candidate_column = match_columns(query_item)
+    rows = db.query(Match).filter(
+        own_column == query_item.id,
+        candidate_column.in_(candidate_ids),
+        Match.model_version == model_version
+    )
+    return {getattr(row, candidate_column.key): row for row in rows}
+
+
+def upsert_matches(db: Session, rows: List[Dict]):
+    """
+    Write Match rows in one statement, replacing the scores of pairs that
+    are already stored for the same model version
+    """
+    upsert(db, Match, rows, ["lost_item_id", "found_item_id", "model_version"])
+
+
+def get_dino_embedding(db: Session, item: Item, img: Image.Image) -> Optional[np.ndarray]:
+    """
+    Return the stored DINOv2 embedding of an item
+
+    Items without a vector for the current model are embedded once here
+    and written to the feature store, so later searches reuse it.
+    """
+    embedding = feature_store.get(db, item.id, "dino")
+    if embedding is not None:
+        return embedding
+    try:
+        embedding = feature_extractor.extract_dino_embedding(img)
+    except Exception as e:
+        logger.warning("⚠️ DINOv2 embedding failed for item %s: %s", item.id, e)
+        return None
+    feature_store.put(db, item.id, "dino", embedding)
+    return embedding
+
+
+def item_text(item: Item) -> str:
+    """Text that the bi-encoder embeds for an item"""
+    return f"{item.item_name}. {item.description}"
+
+
+def get_text_embedding(db: Session, item: Item) -> Optional[np.ndarray]:
+    """
+    Return the stored bi-encoder text embedding of an item, backfilling if missing
+    """
+    embedding = feature_store.get(db, item.id, "text")
+    if embedding is not None:
+        return embedding
+    try:
+        embedding = feature_extractor.extract_text_embedding(item_text(item))
+    except Exception as e:
+        logger.warning("⚠️ Text embedding failed for item %s: %s", item.id, e)
+        return None
+    feature_store.put(db, item.id, "text", embedding)
+    return embedding
+
+
+def get_sift_descriptors(item: Item, img: Image.Image) -> Optional[np.ndarray]:
+    """
+    Return the cached SIFT descriptors of an item, computing them if missing
+    """
+    descriptors = load_sift_descriptors(item.id, item.image_path)
+    if descriptors is not None:
+        return descriptors
+    try:
+        descriptors = feature_extractor.compute_sift_descriptors(img)
+        item.sift_keypoints = save_sift_descriptors(item.id, item.image_path, descriptors)
+    except Exception as e:
+        logger.warning("⚠️ SIFT extraction failed for item %s: %s", item.id, e)
+        return None
+    return descriptors
+
+
+def load_item_embeddings(db: Session, items: List[Item]) -> Tuple[List[Item], List[Optional[np.ndarray]]]:
+    """
+    Stored DINOv2 embeddings of items in one feature-store query, backfilling missing ones
+
+    Returns:
+        (items, embeddings) without the items whose image could not be
+        loaded for a backfill
+    """
+    stored = feature_store.get_many(db, [item.id for item in items], "dino")
+    kept, embeddings = [], []
+    for item in items:
+        embedding = stored.get(item.id)
+        if embedding is None:
+            img = load_clean_image(item.image_path)
+            if img is None:
+                logger.debug("Image missing for candidate %s, skipping", item.id)
+                continue
+            embedding = get_dino_embedding(db, item, img)
+        kept.append(item)
+        embeddings.append(embedding)
+    return kept, embeddings
+
+
+def load_item_descriptors(item: Item) -> Optional[np.ndarray]:
+    """Return the cached SIFT descriptors of an item, backfilling if missing"""
+    descriptors = load_sift_descriptors(item.id, item.image_path)
+    if descriptors is not None:
+        return descriptors
+    img = load_clean_image(item.image_path)
+    if img is None:
+        return None
+    return get_sift_descriptors(item, img)
+
+
+def select_survivors(
+    stage1_scores: np.ndarray,
+    top_m: int,
+    pre_threshold: Optional[float] = None
+) -> np.ndarray:
+    """
+    Indices of the candidates that go on to the expensive stage
+
+    Keeps the top_m best stage-1 scores, dropping any below pre_threshold.
+    """
+    order = np.argsort(-stage1_scores, kind="stable")[:max(top_m, 0)]
+    if pre_threshold is not None:
+        order = order[stage1_scores[order] >= pre_threshold]
+    return order
+
+
+def cascade_survivors(
+    stage1_scores: np.ndarray,
+    text_scores: Optional[np.ndarray],
+    top_m: Optional[int] = None,
+    pre_threshold: Optional[float] = None,
+    text_top_m: Optional[int] = None
+) -> np.ndarray:
+    """
+    Stage-1 survivors plus the best candidates by text-embedding cosine
+    
+    Defaults come from CASCADE_TOP_M, the learned cascade threshold and
+    CASCADE_TEXT_TOP_M. Text survivors already kept by score are not repeated.
+    """
+    if top_m is None:
+        top_m = settings.CASCADE_TOP_M
+    if pre_threshold is None:
+        pre_threshold = ml_service.cascade_threshold
+    if text_top_m is None:
+        text_top_m = settings.CASCADE_TEXT_TOP_M
+    survivors = select_survivors(stage1_scores, top_m, pre_threshold)
+    if text_scores is not None:
+        text_survivors = select_survivors(text_scores, text_top_m)
+        survivors = np.concatenate([survivors, text_survivors[~np.isin(text_survivors, survivors)]])
+    return survivors
+
+
+def retrieve_candidates(
+    db: Session,
+    candidate_type: ItemType,
+    query_embedding: Optional[np.ndarray],
+    query_text_embedding: Optional[np.ndarray] = None
+) -> Tuple[List[Item], int]:
+    """
+    Nearest SEARCH_CANDIDATES items of candidate_type from the vector indexes
+    
+    The DINOv2 hits are merged with the nearest items by text embedding, so
+    a candidate that looks different but is described the same way still
+    reaches scoring. Falls back to every candidate if the query could not
+    be embedded at all.
+    
+    Returns:
+        (candidate items best first, number of candidates available)
+    """
+    if query_embedding is None and query_text_embedding is None:
+        candidate_items = candidate_query(db).filter(
+            Item.item_type == candidate_type
+        ).all()
+        return candidate_items, len(candidate_items)
+    
+    hit_ids, total = [], 0
+    for kind, query in (("dino", query_embedding), ("text", query_text_embedding)):
+        if query is None:
+            continue
+        index = sync_vector_index(db, candidate_type, kind)
+        total = max(total, len(index))
+        for item_id, _ in index.search(query, settings.SEARCH_CANDIDATES):
+            if item_id not in hit_ids:
+                hit_ids.append(item_id)
+    
+    items_by_id = {
+        item.id: item
+        for item in candidate_query(db).filter(Item.id.in_(hit_ids)).all()
+    } if hit_ids else {}
+    return [items_by_id[i] for i in hit_ids if i in items_by_id], total
+
+
+def score_candidates(
+    db: Session,
+    query_item: Item,
+    query_img: Image.Image,
+    query_embedding: Optional[np.ndarray],
+    candidate_items: List[Item],
+    cascade: Optional[bool] = None,
+    query_text_embedding: Optional[np.ndarray] = None,
+    memo: Optional[Dict[int, Match]] = None,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+    cancel: Optional[threading.Event] = None
+) -> Dict:
+    """
+    Two-stage scoring of candidates against a query item
+    
+    Stage 1 scores every candidate with the cheap features (stored DINOv2
+    embeddings, item name, color) through XGBoost, with SIFT and text at
+    their neutral values. Only the survivors (CASCADE_TOP_M best, above the
+    learned cascade threshold if one exists) get SIFT and the reranker
+    before the final XGBoost call. The CASCADE_TEXT_TOP_M candidates with
+    the highest stored text-embedding cosine survive as well, so the
+    cross-encoder only reranks a shortlist yet still sees the best text
+    matches. With cascade=False every candidate survives.
+    
+    Survivors with a row in memo (candidate id -> stored Match of the
+    current model version) reuse its features and prediction instead of
+    running stage 2 again.
+    
+    With on_progress, stage 2 runs in SEARCH_STREAM_BATCH-sized batches and
+    on_progress gets an event (with the survivors' items, features and
+    predictions so far) after stage 1 and after every batch. Setting
+    cancel stops the scoring between batches with SearchCancelled.
+    
+    Returns:
+        items / features / predictions for the survivors, the indices of
+        the survivors scored fresh, the stage-1 items and scores for all
+        candidates, and per-stage counts and timings
+    """
+    if cascade is None:
+        cascade = settings.CASCADE_ENABLED
+    
+    def check_cancelled():
+        if cancel is not None and cancel.is_set():
+            raise SearchCancelled()
+    
+    # Stage 1: cheap features for every candidate
+    check_cancelled()
+    stage1_start = time.perf_counter()
+    stage1_items, candidate_embs = load_item_embeddings(db, candidate_items)
+    
+    stage1_features = feature_extractor.extract_cheap_features_batch(
+        query_img=query_img,
+        candidate_imgs=[None] * len(stage1_items),
+        query_text=query_item.description,
+        candidate_texts=[candidate.description for candidate in stage1_items],
+        item_name=query_item.item_name,
+        query_emb=query_embedding,
+        candidate_embs=candidate_embs
+    )
+    stage1_scores = ml_service.predict_proba(stage1_features)
+    
+    if cascade:
+        survivors = cascade_survivors(
+            stage1_scores, text_cosine_scores(db, query_text_embedding, stage1_items)
+        )
+    else:
+        survivors = np.arange(len(stage1_items))
+    stage1_seconds = time.perf_counter() - stage1_start
+    
+    # Stage 2: SIFT and reranker for the survivors not scored before
+    stage2_start = time.perf_counter()
+    memo = memo or {}
+    items = [stage1_items[i] for i in survivors]
+    features = stage1_features[survivors]
+    predictions = [None] * len(items)
+    fresh = []
+    for i, candidate in enumerate(items):
+        stored = memo.get(candidate.id)
+        if stored is None:
+            fresh.append(i)
+        else:
+            features[i] = match_features(stored)
+            predictions[i] = (int(stored.is_match), float(stored.overall_score))
+    
+    def report(stage: str, scored: int):
+        if on_progress is not None:
+            on_progress({
+                "event": "progress",
+                "stage": stage,
+                "candidates": len(stage1_items),
+                "survivors": len(items),
+                "scored": scored,
+                "to_score": len(fresh),
+                "items": items,
+                "features": features,
+                "predictions": predictions
+            })
+    
+    report("stage1", 0)
+    query_des = get_sift_descriptors(query_item, query_img) if fresh else None
+    batch_size = max(1, settings.SEARCH_STREAM_BATCH) if on_progress is not None else max(1, len(fresh))
+    for start in range(0, len(fresh), batch_size):
+        check_cancelled()
+        batch = fresh[start:start + batch_size]
+        batch_items = [items[i] for i in batch]
+        batch_features = features[batch]
+        feature_extractor.add_expensive_features_batch(
+            batch_features,
+            query_img=query_img,
+            candidate_imgs=[None] * len(batch_items),
+            query_text=query_item.description,
+            candidate_texts=[candidate.description for candidate in batch_items],
+            query_des=query_des,
+            candidate_des=[load_item_descriptors(candidate) for candidate in batch_items]
+        )
+        features[batch] = batch_features
+        for i, prediction in zip(batch, ml_service.batch_predict(batch_features)):
+            predictions[i] = prediction
+        report("stage2", start + len(batch))
+    stage2_seconds = time.perf_counter() - stage2_start
+    
+    search_seconds.observe(stage1_seconds, stage="stage1")
+    search_seconds.observe(stage2_seconds, stage="stage2")
+    search_candidates.observe(len(stage1_items), stage="stage1")
+    search_candidates.observe(len(fresh), stage="stage2")
+    
+    return {
+        "items": items,
+        "features": features,
+        "predictions": predictions,
+        "fresh": fresh,
+        "stage1_items": stage1_items,
+        "stage1_scores": stage1_scores,
+        "stats": {
+            "cascade": cascade,
+            "stage1": {"candidates": len(stage1_items), "seconds": round(stage1_seconds, 4)},
+            "stage2": {"candidates": len(fresh), "reused": len(items) - len(fresh), "seconds": round(stage2_seconds, 4)}
+        }
+    }
+
+
+def text_cosine_scores(
+    db: Session,
+    query_text_embedding: Optional[np.ndarray],
+    items: List[Item]
+) -> Optional[np.ndarray]:
+    """
+    Cosine between the query text embedding and every item's stored one
+    
+    One matrix product over the stacked embeddings; items without a stored
+    embedding score -1 so they never win a text slot.
+    """
+    if query_text_embedding is None or not items:
+        return None
+    ids, matrix = feature_store.get_matrix(db, [item.id for item in items], "text")
+    scores = np.full(len(items), -1.0, dtype=np.float32)
+    if ids and matrix.shape[1] == len(query_text_embedding):
+        row_of = {item.id: i for i, item in enumerate(items)}
+        scores[[row_of[i] for i in ids]] = matrix @ np.asarray(query_text_embedding, dtype=np.float32)
+    return scores
+
+
+def sync_vector_index(db: Session, item_type: ItemType, kind: str = "dino") -> VectorIndex:
+    """
+    Return the "dino" or "text" index for item_type, reconciled with the DB
+
+    The id diff only runs when the DB count differs from the indexed plus
+    skipped items, i.e. on first start without a saved index or after
+    another worker changed the items. Items that cannot be embedded go on
+    the index's skip list instead of being retried by every search.
+    Backfilled vectors are committed before they are appended, so the
+    index never lists an item whose feature row was rolled back. The
+    quantizer is only written when an update changed it. Items gone from
+    the DB also lose their cached SIFT descriptors.
+    """
+    index = get_vector_index(f"{kind}_{item_type.value}")
+    index.refresh()
+    
+    total = db.query(func.count(Item.id)).filter(Item.item_type == item_type).scalar()
+    if total == len(index) + len(index.skipped):
+        return index
+    
+    db_ids = {row[0] for row in db.query(Item.id).filter(Item.item_type == item_type)}
+    changed = False
+    deleted = [i for i in index.ids.tolist() if i not in db_ids]
+    for stale_id in deleted:
+        changed |= index.remove(stale_id, save=False)
+    deleted += [i for i in index.skipped if i not in db_ids]
+    index.unskip(deleted)
+    for deleted_id in deleted:
+        delete_sift_descriptors(deleted_id)
+    
+    missing = [i for i in db_ids if i not in index and i not in index.skipped]
+    unembeddable = []
+    chunk_size = 1000
+    for start in range(0, len(missing), chunk_size):
+        chunk = missing[start:start + chunk_size]
+        stored = feature_store.get_many(db, chunk, kind)
+        unstored = [i for i in chunk if i not in stored]
+        items = candidate_query(db).filter(Item.id.in_(unstored)).all() if unstored else []
+        if kind == "text":
+            stored.update(backfill_text_embeddings(db, items))
+        else:
+            for item in items:
+                img = load_clean_image(item.image_path)
+                embedding = get_dino_embedding(db, item, img) if img is not None else None
+                if embedding is not None:
+                    stored[item.id] = embedding
+        unembeddable.extend(i for i in unstored if i not in stored)
+        if unstored:
+            try:
+                with stage_timer("db_commit"):
+                    db.commit()
+            except Exception as e:
+                # Not the items' fault: leave them for the next sync
+                logger.warning("⚠️ Failed to store backfilled %s embeddings: %s", kind, e)
+                db.rollback()
+                stored = {i: vector for i, vector in stored.items() if i not in unstored}
+        new_ids = list(stored)
+        vectors = [stored[i] for i in new_ids]
+        if new_ids:
+            changed |= index.add_many(new_ids, np.vstack(vectors), save=False)
+    
+    if unembeddable:
+        logger.warning("⚠️ %d %s items cannot be embedded for %s; skipped until re-synced",
+                       len(unembeddable), item_type.value, kind)
+        index.skip(unembeddable)
+    if changed:
+        index.save()
+    logger.info("🗂️ Synced %s_%s index: %d/%d items", kind, item_type.value, len(index), total)
+    return index
+
+
+def backfill_text_embeddings(db: Session, items: List[Item]) -> Dict[int, np.ndarray]:
+    """
+    Encode the text embeddings of items in one batch and store them
+    
+    Returns:
+        {item_id: embedding}, empty if encoding failed
+    """
+    if not items:
+        return {}
+    try:
+        encoded = feature_extractor.extract_text_embeddings([item_text(item) for item in items])
+    except Exception as e:
+        logger.warning("⚠️ Text embedding backfill failed: %s", e)
+        return {}
+    ids = [item.id for item in items]
+    feature_store.put_many(db, ids, "text", encoded)
+    return dict(zip(ids, encoded))
+
+
+def candidate_type_of(query_item: Item) -> ItemType:
+    """Items of the other type are the candidates"""
+    return ItemType.FOUND if query_item.item_type == ItemType.LOST else ItemType.LOST
+
+
+def latest_candidate_mark(db: Session, candidate_type: ItemType) -> Optional[Tuple]:
+    """
+    (created_at, id) of the newest item of candidate_type, or None if there are none
+    
+    Only the id bounds later searches; the timestamp is stored alongside
+    for reference.
+    """
+    return db.query(Item.created_at, Item.id).filter(
+        Item.item_type == candidate_type
+    ).order_by(
+        Item.id.desc()
+    ).first()
+
+
+def load_watermark(db: Session, query_item: Item, model_version: str) -> Optional[SearchWatermark]:
+    """The query item's watermark, if one was stored for the current model version"""
+    watermark = db.get(SearchWatermark, query_item.id)
+    if watermark is None or watermark.model_version != model_version:
+        return None
+    return watermark
+
+
+def save_watermark(db: Session, query_item: Item, model_version: str, mark: Optional[Tuple]):
+    """Record the newest candidate considered (committed by the caller)"""
+    if mark is None:
+        return
+    db.merge(SearchWatermark(
+        item_id=query_item.id,
+        model_version=model_version,
+        candidate_created_at=mark[0],
+        candidate_id=mark[1]
+    ))
+
+
+def newer_candidates(db: Session, candidate_type: ItemType, watermark: SearchWatermark, limit: int) -> List[Item]:
+    """
+    Candidates uploaded after the watermark, oldest first
+    
+    Item ids are monotonic, so the watermark compares the id alone; the
+    stored timestamp is informational (SQLite keeps server timestamps at a
+    different precision than bound datetimes, so equality on it never held).
+    """
+    return candidate_query(db, Item.created_at).filter(
+        Item.item_type == candidate_type,
+        Item.id > watermark.candidate_id
+    ).order_by(
+        Item.id
+    ).limit(limit).all()
+
+
+def load_query(db: Session, query_item: Item) -> Tuple[Image.Image, Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    Query image and stored (or backfilled) embeddings of the query item
+    
+    Raises:
+        HTTPException: If the query image cannot be loaded
+    """
+    query_img = load_clean_image(query_item.image_path)
+    if query_img is None:
+        logger.error("❌ Failed to load query image %s", query_item.image_path)
+        raise HTTPException(status_code=500, detail=f"Query image not found or unreadable: {query_item.image_path}")
+    
+    return query_img, get_dino_embedding(db, query_item, query_img), get_text_embedding(db, query_item)
+
+
+def score_and_store(
+    db: Session,
+    query_item: Item,
+    query: Tuple[Image.Image, Optional[np.ndarray], Optional[np.ndarray]],
+    candidate_items: List[Item],
+    model_version: str,
+    mark: Optional[Tuple] = None,
+    top_k: int = 5,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+    cancel: Optional[threading.Event] = None
+) -> Tuple[Dict, List[Dict]]:
+    """
+    Score candidates, upsert the new Match rows and move the watermark
+    
+    on_progress receives score_candidates' progress events with the
+    provisional top_k matches in place of the raw arrays.
+    
+    Returns:
+        (score_candidates result, formatted matches)
+    """
+    query_img, query_embedding, query_text_embedding = query
+    memo = load_match_memo(db, query_item, [candidate.id for candidate in candidate_items], model_version)
+    
+    def report(event: Dict):
+        partial = [
+            format_match(candidate, row, prediction[0], prediction[1])
+            for candidate, row, prediction in zip(event.pop("items"), event.pop("features"), event.pop("predictions"))
+            if prediction is not None
+        ]
+        partial.sort(key=lambda x: x['confidence'], reverse=True)
+        event["top_matches"] = partial[:top_k]
+        on_progress(event)
+    
+    scored = score_candidates(
+        db, query_item, query_img, query_embedding, candidate_items,
+        query_text_embedding=query_text_embedding,
+        memo=memo,
+        on_progress=report if on_progress is not None else None,
+        cancel=cancel
+    )
+    fresh = set(scored["fresh"])
+    
+    matches = []
+    match_rows = []
+    for i, (candidate, row, (prediction, confidence)) in enumerate(
+        zip(scored["items"], scored["features"], scored["predictions"])
+    ):
+        # Add to results
+        matches.append(format_match(candidate, row, prediction, confidence))
+        if i not in fresh:
+            continue
+        
+        # Store match result in database
+        if query_item.item_type == ItemType.LOST:
+            lost_id = query_item.id
+            found_id = candidate.id
+        else:
+            lost_id = candidate.id
+            found_id = query_item.id
+        
+        match_rows.append({
+            "lost_item_id": lost_id,
+            "found_item_id": found_id,
+            "overall_score": float(confidence),
+            "dino_similarity": float(row[0]),
+            "sift_similarity": float(row[1]),
+            "text_similarity": float(row[2]),
+            "item_name_similarity": float(row[3]),
+            "color_match": float(row[4]),
+            "is_match": int(prediction),
+            "confidence": float(confidence * 100),
+            "model_version": model_version
+        })
+    
+    # Upsert the new match records in one statement
+    try:
+        upsert_matches(db, match_rows)
+        save_watermark(db, query_item, model_version, mark)
+        with stage_timer("db_commit"):
+            db.commit()
+        logger.debug("✅ %d match records saved", len(match_rows))
+    except Exception as e:
+        logger.warning("⚠️ Failed to save match records: %s", e)
+        db.rollback()
+    
+    return scored, matches
+
+
+def run_matching(
+    db: Session,
+    query_item: Item,
+    top_k: int = 5,
+    full: bool = False,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+    cancel: Optional[threading.Event] = None
+) -> Dict:
+    """
+    Score a query item against its candidates and store the Match rows
+    
+    After the first search the item keeps a watermark of the newest
+    candidate considered. Later searches only score candidates uploaded
+    after it and merge them with the stored results, unless full=True,
+    the model version changed, or more than SEARCH_CANDIDATES items were
+    uploaded in between.
+    
+    Args:
+        db: Database session
+        query_item: Item to find matches for
+        top_k: Number of top matches to return
+        full: Ignore the watermark and search the whole inventory
+        on_progress: Called with progress events and provisional top-K
+        cancel: Set to abandon the search (raises SearchCancelled)
+    
+    Returns:
+        Search response with the top matches
+    """
+    candidate_type = candidate_type_of(query_item)
+    model_version = current_model_version()
+    
+    watermark = None if full else load_watermark(db, query_item, model_version)
+    if watermark is not None:
+        new_items = newer_candidates(db, candidate_type, watermark, settings.SEARCH_CANDIDATES + 1)
+        if len(new_items) <= settings.SEARCH_CANDIDATES:
+            return run_incremental_matching(db, query_item, new_items, model_version, top_k, on_progress, cancel)
+    
+    # Determine search direction
+    search_type = "FOUND" if candidate_type == ItemType.FOUND else "LOST"
+    
+    # Everything up to here counts as considered, even if not retrieved
+    mark = latest_candidate_mark(db, candidate_type)
+    
+    query = load_query(db, query_item)
+    candidate_items, total_available = retrieve_candidates(db, candidate_type, query[1], query[2])
+    
+    if not candidate_items:
+        db.commit()  # keep any backfilled embeddings
+        return {
+            "status": "no_candidates",
+            "message": f"No {search_type} items available to match",
+            "query_item": item_summary(query_item),
+            "matches": []
+        }
+    
+    scored, matches = score_and_store(
+        db, query_item, query, candidate_items, model_version, mark,
+        top_k=top_k, on_progress=on_progress, cancel=cancel
+    )
+    
+    # Sort by confidence and get top K
+    matches.sort(key=lambda x: x['confidence'], reverse=True)
+    top_matches = matches[:top_k]
+    
+    stats = scored["stats"]
+    logger.info(
+        "📊 Search %s: %d of %d %s candidates, stage 1 %.3fs, stage 2 %d in %.3fs (%d reused)",
+        query_item.tracking_token, stats["stage1"]["candidates"], total_available, search_type,
+        stats["stage1"]["seconds"], stats["stage2"]["candidates"], stats["stage2"]["seconds"],
+        stats["stage2"]["reused"]
+    )
+    
+    return {
+        "status": "success",
+        "source": "computed",
+        "query_item": item_summary(query_item),
+        "total_candidates_available": total_available,
+        "total_candidates_checked": len(scored["items"]),
+        "stages": scored["stats"],
+        "total_matches_found": len([m for m in matches if m['is_match']]),
+        "top_matches": top_matches
+    }
+
+
+def run_incremental_matching(
+    db: Session,
+    query_item: Item,
+    new_items: List[Item],
+    model_version: str,
+    top_k: int = 5,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+    cancel: Optional[threading.Event] = None
+) -> Dict:
+    """
+    Score only the candidates uploaded since the watermark and merge them
+    with the stored Match rows of the current model version
+    """
+    stats = None
+    if new_items:
+        logger.info("🔎 Incremental search %s: %d new candidates", query_item.tracking_token, len(new_items))
+        query = load_query(db, query_item)
+        mark = (new_items[-1].created_at, new_items[-1].id)
+        scored, _ = score_and_store(
+            db, query_item, query, new_items, model_version, mark,
+            top_k=top_k, on_progress=on_progress, cancel=cancel
+        )
+        stats = scored["stats"]
+    
+    result = get_precomputed_matches(db, query_item, top_k, model_version)
+    result["source"] = "incremental"
+    result["new_candidates_checked"] = len(new_items)
+    if stats is not None:
+        result["stages"] = stats
+    return result
+
+
+def get_precomputed_matches(
+    db: Session,
+    query_item: Item,
+    top_k: int = 5,
+    model_version: Optional[str] = None
+) -> Dict:
+    """
+    Serve stored Match rows for an item instead of scoring again
+    
+    Rows come from this item's own matching job and from jobs of items
+    uploaded later on the other side; the newest row per candidate wins.
+    With model_version only rows of that version are used.
+    """
+    own_column, candidate_column = match_columns(query_item)
+    
+    query = db.query(Match, Item).options(
+        load_only(*CANDIDATE_COLUMNS)
+    ).join(
+        Item, Item.id == candidate_column
+    ).filter(
+        own_column == query_item.id
+    )
+    if model_version is not None:
+        query = query.filter(Match.model_version == model_version)
+    rows = query.order_by(
+        Match.created_at.desc(), Match.id.desc()
+    ).all()
+    
+    latest = {}
+    for match, candidate in rows:
+        latest.setdefault(candidate.id, (match, candidate))
+    
+    matches = [
+        format_match(candidate, match_features(match), match.is_match, match.overall_score)
+        for match, candidate in latest.values()
+    ]
+    matches.sort(key=lambda x: x['confidence'], reverse=True)
+    
+    return {
+        "status": "success",
+        "source": "precomputed",
+        "query_item": item_summary(query_item),
+        "total_candidates_checked": len(matches),
+        "total_matches_found": len([m for m in matches if m['is_match']]),
+        "top_matches": matches[:top_k]
+    }
+
+
+def search_by_token(
+    tracking_token: str,
+    top_k: int = 5,
+    full: bool = False,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+    cancel: Optional[threading.Event] = None
+) -> Dict:
+    """
+    Match one item in its own DB session
+    
+    Top-level so it can run in the inference executor (thread or process;
+    on_progress and cancel only work with threads). full=True ignores the
+    search watermark.
+    
+    Raises:
+        LookupError: If no item has this tracking token
+    """
+    db = SessionLocal()
+    try:
+        query_item = db.query(Item).filter(
+            Item.tracking_token == tracking_token
+        ).first()
+        if not query_item:
+            raise LookupError(f"Item not found: {tracking_token}")
+        
+        return run_matching(db, query_item, top_k, full, on_progress, cancel)
+    finally:
+        db.close()
+
+
+def run_matching_job(tracking_token: str) -> int:
+    """
+    Background entry point for the match queue
+    
+    Returns:
+        Number of candidates scored
+    """
+    result = search_by_token(tracking_token)
+    return result.get("new_candidates_checked", result.get("total_candidates_checked", 0))
@@ -9,19 +9,36 @@ import joblib
 import torch
 import json               
 import numpy as np        
-from typing import List, Dict, Tuple, Optional 
+from typing import List, Dict, Tuple, Union
+import threading
+import hashlib
+import logging
+from app.config import settings
+from app.services.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
 
 
 
 class MLService:
-    def __init__(self, model_dir: str = "ml_models"):
+    def __init__(self, model_dir: str = settings.MODEL_DIR):
         self.model_dir = Path(model_dir)
         self.model = None
         self.threshold = 0.5
+        self.cascade_threshold = None
         self.metadata = None
+        self.model_hash = None
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        
-        self._load_model()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+    
+    def ensure_loaded(self):
+        """Load the model on first use, thread-safe"""
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self._load_model()
+                    self._loaded = True
     
     def _load_model(self):
         """Load trained XGBoost model and metadata"""
@@ -29,25 +46,37 @@ class MLService:
             # Load XGBoost model
             model_path = self.model_dir / "xgboost_model.pkl"
             self.model = joblib.load(model_path)
-            print(f"Model loaded from {model_path}")
+            logger.info("Model loaded from %s", model_path)
             
             # Load threshold
             threshold_path = self.model_dir / "best_threshold.txt"
             if threshold_path.exists():
                 self.threshold = float(threshold_path.read_text().strip())
-                print(f"Threshold loaded: {self.threshold:.4f}")
+                logger.info("Threshold loaded: %.4f", self.threshold)
+            
+            # Fingerprint of everything that decides a prediction
+            self.model_hash = hashlib.sha1(
+                model_path.read_bytes() + f"{self.threshold}".encode()
+            ).hexdigest()[:12]
+            
+            # Load stage-1 cascade threshold (written by scripts/check_cascade_recall.py)
+            cascade_path = self.model_dir / "cascade_threshold.txt"
+            if cascade_path.exists():
+                self.cascade_threshold = float(cascade_path.read_text().strip())
+                logger.info("Cascade threshold loaded: %.4f", self.cascade_threshold)
             
             # Load metadata
             metadata_path = self.model_dir / "model_metadata.json"
             if metadata_path.exists():
                 with open(metadata_path) as f:
                     self.metadata = json.load(f)
-                print(f"Model metadata loaded")
-                print(f"   Training date: {self.metadata.get('training_date')}")
-                print(f"   Test accuracy: {self.metadata.get('test_accuracy', 0)*100:.2f}%")
+                logger.info(
+                    "Model metadata loaded (trained %s, test accuracy %.2f%%)",
+                    self.metadata.get('training_date'), self.metadata.get('test_accuracy', 0) * 100
+                )
             
         except Exception as e:
-            print(f"Error loading model: {e}")
+            logger.error("Error loading model: %s", e)
             raise
     
     def predict(self, features: np.ndarray) -> Tuple[int, float]:
@@ -62,39 +91,57 @@ class MLService:
             prediction: 0 (no match) or 1 (match)
             confidence: probability score (0.0 to 1.0)
         """
-        if self.model is None:
-            raise RuntimeError("Model not loaded")
+        self.ensure_loaded()
         
         # Ensure features is 2D array
         if features.ndim == 1:
             features = features.reshape(1, -1)
         
         # Get probability predictions
-        proba = self.model.predict_proba(features)[0, 1]
+        with stage_timer("xgboost"):
+            proba = self.model.predict_proba(features)[0, 1]
         
         # Apply threshold
         prediction = 1 if proba >= self.threshold else 0
         
         return prediction, float(proba)
     
-    def batch_predict(self, features_list: List[np.ndarray]) -> List[Tuple[int, float]]:
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """
+        Match probabilities for an (N, 5) feature matrix
+        
+        Returns:
+            Array of probabilities (0.0 to 1.0)
+        """
+        self.ensure_loaded()
+        
+        if len(features) == 0:
+            return np.zeros(0)
+        
+        with stage_timer("xgboost"):
+            return self.model.predict_proba(np.atleast_2d(features))[:, 1]
+    
+    def batch_predict(self, features_list: Union[List[np.ndarray], np.ndarray]) -> List[Tuple[int, float]]:
         """
         Predict for multiple feature sets
         
         Args:
-            features_list: List of feature arrays
+            features_list: List of feature arrays, or an (N, 5) feature matrix
         
         Returns:
             List of (prediction, confidence) tuples
         """
-        if self.model is None:
-            raise RuntimeError("Model not loaded")
+        self.ensure_loaded()
+        
+        if len(features_list) == 0:
+            return []
         
         # Stack features
         X = np.vstack(features_list)
         
         # Get probabilities
-        probas = self.model.predict_proba(X)[:, 1]
+        with stage_timer("xgboost"):
+            probas = self.model.predict_proba(X)[:, 1]
         
         # Apply threshold
         predictions = (probas >= self.threshold).astype(int)
@@ -106,6 +153,8 @@ class MLService:
         return {
             "model_loaded": self.model is not None,
             "threshold": self.threshold,
+            "cascade_threshold": self.cascade_threshold,
+            "model_hash": self.model_hash,
             "device": self.device,
             "metadata": self.metadata
         }
@@ -0,0 +1,130 @@
+"""
+ONNX Backend - Export DINOv2 / BGE Reranker to ONNX and run them with ONNX Runtime
+"""
+from app.config import settings
+from pathlib import Path
+import torch
+
+ONNX_DIR = Path(settings.MODEL_DIR) / "onnx"
+DINO_ONNX_PATH = ONNX_DIR / "dinov2.onnx"
+RERANKER_ONNX_PATH = ONNX_DIR / "reranker.onnx"
+
+
+def onnx_model_path(path: Path, precision: str = "fp32") -> Path:
+    """Path of the graph for a precision mode; int8 uses the quantized copy"""
+    if precision == "int8":
+        return path.with_suffix(".int8.onnx")
+    return path
+
+
+def quantize_onnx_model(path: Path) -> Path:
+    """
+    Write an int8 dynamically quantized copy of an exported graph
+
+    Returns:
+        Path of the quantized model
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    output = onnx_model_path(path, "int8")
+    quantize_dynamic(str(path), str(output), weight_type=QuantType.QInt8)
+    return output
+
+
+def create_onnx_session(path: Path):
+    """
+    Open an ONNX Runtime CPU session with the configured threading
+
+    ONNX_INTRA_OP_THREADS / ONNX_INTER_OP_THREADS of 0 keep ORT's defaults.
+    Several sessions share the cores with the inference executor, so on
+    busy nodes set intra-op threads to cores / INFERENCE_WORKERS.
+    """
+    import onnxruntime as ort
+
+    if not Path(path).exists():
+        raise FileNotFoundError(
+            f"{path} not found; run `python -m scripts.export_onnx` first"
+        )
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    if settings.ONNX_INTRA_OP_THREADS > 0:
+        options.intra_op_num_threads = settings.ONNX_INTRA_OP_THREADS
+    if settings.ONNX_INTER_OP_THREADS > 0:
+        options.inter_op_num_threads = settings.ONNX_INTER_OP_THREADS
+
+    return ort.InferenceSession(str(path), sess_options=options, providers=["CPUExecutionProvider"])
+
+
+class DinoEmbeddingHead(torch.nn.Module):
+    """DINOv2 plus the mean-pool / L2-normalise step, so ONNX outputs embeddings"""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        hidden = self.model(pixel_values=pixel_values).last_hidden_state.mean(dim=1)
+        return torch.nn.functional.normalize(hidden, dim=1)
+
+
+class RerankerLogits(torch.nn.Module):
+    """Cross-encoder returning raw logits of shape (batch,)"""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits.view(-1)
+
+
+def export_dinov2(model: torch.nn.Module, path: Path = DINO_ONNX_PATH, image_size: int = 224, opset: int = 17):
+    """
+    Export DINOv2 with a dynamic batch dimension
+
+    Input:  pixel_values (batch, 3, image_size, image_size) float32
+    Output: embedding    (batch, hidden_size) float32, L2-normalised
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dummy = torch.randn(2, 3, image_size, image_size)
+    torch.onnx.export(
+        DinoEmbeddingHead(model.cpu().eval()),
+        (dummy,),
+        str(path),
+        input_names=["pixel_values"],
+        output_names=["embedding"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "embedding": {0: "batch"}},
+        opset_version=opset,
+        dynamo=False
+    )
+
+
+def export_reranker(model: torch.nn.Module, tokenizer, path: Path = RERANKER_ONNX_PATH, opset: int = 17):
+    """
+    Export the BGE Reranker with dynamic batch and sequence dimensions
+
+    Inputs: input_ids, attention_mask (batch, sequence) int64
+    Output: logits (batch,) float32
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dummy = tokenizer(
+        [("black leather wallet", "found a black wallet near the library")] * 2,
+        padding=True,
+        return_tensors="pt"
+    )
+    torch.onnx.export(
+        RerankerLogits(model.cpu().eval()),
+        (dummy["input_ids"], dummy["attention_mask"]),
+        str(path),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"}
+        },
+        opset_version=opset,
+        dynamo=False
+    )
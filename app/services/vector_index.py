@@ -0,0 +1,341 @@
+"""
+Vector Index - In-process nearest neighbour retrieval over item embeddings
+Exact NumPy search for small sets, IVF (k-means inverted lists) for large ones
+"""
+from app.config import settings
+from app.services.embedding_matrix import EmbeddingMatrix
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+import threading
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index keyed by item id
+
+    Vectors are stored L2-normalised in a memory-mapped EmbeddingMatrix,
+    so similarity is a dot product and every worker process reads the same
+    pages. Below `brute_force_max` entries every live row is scored
+    exactly; above it the index trains a k-means coarse quantizer and only
+    scores the `nprobe` closest inverted lists. The quantizer (centroids
+    and per-row list assignments) is saved next to the matrix.
+
+    Items that cannot be embedded (image missing, encoding failed) are
+    recorded in a skip list saved next to the index, so reconciling with
+    the DB does not retry them on every search. Deleting the
+    {name}.skipped.npy file makes the next sync try them again.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        brute_force_max: int = settings.ANN_BRUTE_FORCE_MAX,
+        nlist: int = settings.ANN_NLIST,
+        nprobe: int = settings.ANN_NPROBE
+    ):
+        self.matrix = EmbeddingMatrix(directory, name)
+        self.path = Path(directory) / f"{name}.ivf.npz"
+        self.skip_path = Path(directory) / f"{name}.skipped.npy"
+        self.brute_force_max = brute_force_max
+        self.nlist = nlist
+        self.nprobe = nprobe
+
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self._trained_size = 0
+        self._generation = self.matrix.generation
+        self._mtime = 0.0
+        self.skipped: Set[int] = set()
+        self._skipped_mtime = 0.0
+        self._lock = threading.RLock()
+
+        self.load()
+        self._load_skipped()
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self.matrix
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.matrix.ids
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def load(self) -> bool:
+        """Load the saved quantizer; returns False if there is none for this matrix"""
+        with self._lock:
+            loaded = False
+            if self.path.exists():
+                try:
+                    with np.load(self.path) as data:
+                        if int(data["generation"]) == self.matrix.generation and data["centroids"].size:
+                            self.centroids = data["centroids"]
+                            self.assignments = data["assignments"].astype(np.int32)
+                            self._trained_size = int(data["trained_size"])
+                            self._generation = self.matrix.generation
+                            loaded = True
+                    self._mtime = self.path.stat().st_mtime
+                except Exception as e:
+                    logger.warning("⚠️ Failed to load vector index %s: %s", self.path, e)
+            self._sync_assignments()
+            return loaded
+
+    def refresh(self):
+        """Pick up rows appended, quantizers and skip lists saved by other processes"""
+        with self._lock:
+            self.matrix.refresh()
+            if self.path.exists() and self.path.stat().st_mtime > self._mtime:
+                self.load()
+            else:
+                self._sync_assignments()
+            self._load_skipped()
+
+    def _load_skipped(self):
+        if not self.skip_path.exists():
+            self.skipped, self._skipped_mtime = set(), 0.0
+            return
+        mtime = self.skip_path.stat().st_mtime
+        if mtime <= self._skipped_mtime:
+            return
+        try:
+            self.skipped = set(np.load(self.skip_path).tolist())
+            self._skipped_mtime = mtime
+        except Exception as e:
+            logger.warning("⚠️ Failed to load skip list %s: %s", self.skip_path, e)
+
+    def _save_skipped(self):
+        self.skip_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.skip_path.with_suffix(".tmp.npy")
+        np.save(tmp_path, np.asarray(sorted(self.skipped), dtype=np.int64))
+        os.replace(tmp_path, self.skip_path)
+        self._skipped_mtime = self.skip_path.stat().st_mtime
+
+    def skip(self, item_ids: Iterable[int]):
+        """Record items that could not be embedded"""
+        with self._lock:
+            new = set(item_ids) - self.skipped
+            if new:
+                self.skipped |= new
+                self._save_skipped()
+
+    def unskip(self, item_ids: Iterable[int]):
+        """Forget skipped items (indexed since, or gone from the DB)"""
+        with self._lock:
+            gone = self.skipped.intersection(item_ids)
+            if gone:
+                self.skipped -= gone
+                self._save_skipped()
+
+    def save(self):
+        """Atomically write the quantizer; the vectors are already on disk"""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp.npz")
+            np.savez(
+                tmp_path,
+                centroids=self.centroids if self.centroids is not None else np.empty((0, 0), dtype=np.float32),
+                assignments=self.assignments,
+                trained_size=np.int64(self._trained_size),
+                generation=np.int64(self._generation)
+            )
+            os.replace(tmp_path, self.path)
+            self._mtime = self.path.stat().st_mtime
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def add(self, item_id: int, vector: np.ndarray, save: bool = True) -> bool:
+        """Insert or replace the vector of one item"""
+        return self.add_many([item_id], np.asarray(vector).reshape(1, -1), save=save)
+
+    def add_many(self, item_ids: List[int], vectors: np.ndarray, save: bool = True) -> bool:
+        """
+        Insert or replace the vectors of several items (appended to the matrix)
+
+        Args:
+            save: Write the quantizer if it was retrained; pass False to
+                batch several updates and call save() once
+
+        Returns:
+            True if the quantizer changed and has not been saved yet
+        """
+        if len(item_ids) == 0:
+            return False
+        vectors = self._normalize(np.asarray(vectors).reshape(len(item_ids), -1))
+
+        with self._lock:
+            self.matrix.append(item_ids, vectors)
+            self.unskip(item_ids)
+            self._sync_assignments()
+            retrained = self._maybe_train()
+            if save and retrained:
+                self.save()
+                return False
+            return retrained
+
+    def remove(self, item_id: int, save: bool = True) -> bool:
+        """
+        Tombstone an item; its row is dropped at the next compaction
+
+        Shrinking back to brute-force size drops the quantizer, which is
+        saved (or reported, with save=False) like in add_many.
+
+        Returns:
+            True if the quantizer changed and has not been saved yet
+        """
+        with self._lock:
+            if item_id not in self.matrix:
+                return False
+            self.matrix.delete([item_id])
+            self._sync_assignments()
+            retrained = self._maybe_train()
+            if save and retrained:
+                self.save()
+                return False
+            return retrained
+
+    # ------------------------------------------------------------------
+    # IVF coarse quantizer
+    # ------------------------------------------------------------------
+
+    def _sync_assignments(self):
+        """Assign rows appended since the last call; all rows after a compaction"""
+        if self.centroids is None:
+            return
+        vectors, _, _ = self.matrix.snapshot()
+        if self.matrix.generation != self._generation:
+            self.assignments = np.empty(0, dtype=np.int32)
+            self._generation = self.matrix.generation
+        if vectors is not None and len(vectors) > len(self.assignments):
+            tail = np.asarray(vectors[len(self.assignments):])
+            self.assignments = np.concatenate([self.assignments, self._assign(tail)])
+
+    def _maybe_train(self) -> bool:
+        """
+        (Re)train the coarse quantizer once the index has outgrown brute force
+
+        Returns:
+            True if the quantizer changed
+        """
+        n = len(self.matrix)
+        if n <= self.brute_force_max:
+            changed = self.centroids is not None
+            self.centroids = None
+            self.assignments = np.empty(0, dtype=np.int32)
+            self._trained_size = 0
+            return changed
+        if self.centroids is None or n >= 2 * self._trained_size:
+            self._train()
+            return True
+        return False
+
+    def _train(self, iterations: int = 10):
+        """Spherical k-means over the live vectors"""
+        vectors, _, live = self.matrix.snapshot()
+        all_vectors = np.asarray(vectors)
+        live_vectors = all_vectors[live]
+        n = len(live_vectors)
+        nlist = self.nlist if self.nlist > 0 else int(np.sqrt(n))
+        nlist = max(1, min(nlist, n))
+
+        rng = np.random.default_rng(0)
+        centroids = live_vectors[rng.choice(n, size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmax(live_vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, live_vectors)
+            empty = np.bincount(assignments, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = self._normalize(sums)
+
+        self.centroids = centroids
+        self.assignments = self._assign(all_vectors)
+        self._generation = self.matrix.generation
+        self._trained_size = n
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """
+        Find the k most similar items
+
+        Args:
+            query: Query embedding
+            k: Number of neighbours to return
+
+        Returns:
+            List of (item_id, cosine_similarity), best first
+        """
+        query = self._normalize(np.asarray(query).reshape(-1))
+
+        with self._lock:
+            vectors, row_ids, live = self.matrix.snapshot()
+            if vectors is None or k <= 0:
+                return []
+            vectors = np.asarray(vectors)
+
+            rows = None
+            if self.centroids is not None and len(self.assignments) == len(row_ids):
+                nprobe = min(self.nprobe, len(self.centroids))
+                probe = np.argsort(-(self.centroids @ query))[:nprobe]
+                rows = np.flatnonzero(np.isin(self.assignments, probe) & live)
+                if len(rows) < k:
+                    rows = None
+
+        if rows is None:
+            rows = np.flatnonzero(live)
+            if len(rows) == len(row_ids):
+                scores = vectors @ query
+            else:
+                scores = (vectors @ query)[rows]
+        else:
+            scores = vectors[rows] @ query
+        ids = row_ids[rows]
+
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+
+_indexes: Dict[str, VectorIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_vector_index(name: str) -> VectorIndex:
+    """
+    Get the shared index with the given name, e.g. "dino_found"
+
+    Indexes live under MODEL_DIR/embeddings and are mapped on first use.
+    """
+    with _indexes_lock:
+        if name not in _indexes:
+            _indexes[name] = VectorIndex(Path(settings.MODEL_DIR) / "embeddings", name)
+        return _indexes[name]
@@ -0,0 +1,452 @@
+"""
+Offline benchmark of the upload and search paths
+
+Generates synthetic items (textured shape images plus templated
+descriptions) into a throwaway SQLite database and a temporary
+UPLOAD_DIR, then times:
+
+    upload     process_and_save_image, and the whole upload (features,
+               feature store, vector index) through handle_item_upload
+    features   every FeatureExtractor stage on its own
+    ml         MLService.predict called per row vs one batch_predict
+    search     /search/{tracking_token} end to end at each inventory
+               size: a full search (refresh=true), then the incremental
+               re-search that reads the stored matches
+
+With --models tiny (the default) DINOv2, the reranker and the text
+encoder are randomly initialised miniature models of the same
+architectures and rembg keeps every pixel, so the run needs no download
+and no GPU; the numbers track the pipeline overhead around the models,
+not model quality. --models real uses the configured models. XGBoost is
+always the real ml_models/xgboost_model.pkl.
+
+Results are written as JSON (with the git commit) so runs can be
+compared across commits with --baseline.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --sizes 100 1000 --queries 10 --json before.json
+    python -m benchmarks.bench_pipeline --json after.json --baseline before.json
+"""
+import argparse
+import asyncio
+import inspect
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+START_DIR = Path.cwd()
+
+# Point the app at scratch storage before anything reads the settings.
+# load_clean_image resolves image paths under ./static, so run from there.
+_workdir = Path(tempfile.mkdtemp(prefix="bench_pipeline_"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir / 'bench.db'}"
+os.environ["UPLOAD_DIR"] = str(_workdir / "static" / "uploads")
+os.environ["MODEL_DIR"] = str(_workdir / "ml_models")
+os.environ["MATCH_QUEUE_WORKERS"] = "0"
+os.environ.setdefault("DINO_BATCH_MAX_SIZE", "1")  # time the model, not the batching window
+sys.path.insert(0, str(REPO_DIR))
+os.chdir(_workdir)
+
+import numpy as np
+import torch
+from fastapi import UploadFile
+from PIL import Image, ImageDraw
+
+from app.config import settings
+from app.core.database import Base, SessionLocal, engine
+from app.models.database_models import Item, ItemType
+from app.api.routes.search import search_matches
+from app.api.routes.upload import handle_item_upload
+from app.services import image_processor
+from app.services.feature_extractor import FeatureExtractor, feature_extractor
+from app.services.image_processor import process_and_save_image
+from app.services.ml_service import ml_service
+
+COLORS = {
+    "black": (25, 25, 25), "white": (235, 235, 235), "red": (200, 30, 40), "blue": (30, 60, 190),
+    "green": (40, 150, 60), "brown": (120, 75, 40), "silver": (170, 170, 180), "pink": (230, 120, 170)
+}
+OBJECTS = ["wallet", "phone", "backpack", "umbrella", "keys", "watch", "headphones", "bottle", "laptop", "jacket"]
+PLACES = ["library", "bus", "cafeteria", "gym", "station", "park", "lecture hall", "parking lot"]
+DETAILS = ["a sticker", "a scratch on the side", "a keychain", "a name tag", "a torn strap", "a zipper pocket"]
+WORDS = sorted(set(
+    list(COLORS) + OBJECTS + " ".join(PLACES + DETAILS).split()
+    + "left near the with lost found item".split()
+))
+
+
+# ----------------------------------------------------------------------
+# Synthetic data
+# ----------------------------------------------------------------------
+
+def synthetic_item(i: int, rng: np.random.Generator) -> dict:
+    """One item: name, description and a JPEG of a textured shape"""
+    color = list(COLORS)[rng.integers(len(COLORS))]
+    obj = OBJECTS[rng.integers(len(OBJECTS))]
+    description = f"{color} {obj} left near the {PLACES[rng.integers(len(PLACES))]} with {DETAILS[rng.integers(len(DETAILS))]}"
+
+    img = Image.new("RGB", (480, 360), (250, 250, 250))
+    draw = ImageDraw.Draw(img)
+    x, y, w, h = (int(v) for v in rng.integers([40, 40, 120, 120], [200, 120, 240, 220]))
+    draw.rounded_rectangle([x, y, x + w, y + h], radius=int(rng.integers(5, 40)), fill=COLORS[color])
+    for _ in range(25):  # edges and corners for SIFT
+        x0, y0, x1, y1 = (int(v) for v in rng.integers(0, 360, size=4))
+        draw.line([x0, y0, x1, y1], fill=tuple(int(v) for v in rng.integers(0, 255, size=3)), width=2)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=90)
+    return {"item_name": obj, "description": description, "image": buffer.getvalue()}
+
+
+def upload_file(data: bytes, filename: str = "bench.jpg") -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+# ----------------------------------------------------------------------
+# Offline models
+# ----------------------------------------------------------------------
+
+class PassthroughRembgSession:
+    """rembg session that keeps every pixel (u2net is never downloaded)"""
+
+    def predict(self, img, *args, **kwargs):
+        return [Image.new("L", img.size, 255)]
+
+
+def install_tiny_models(extractor: FeatureExtractor):
+    """
+    Swap in randomly initialised miniature DINOv2, XLM-R reranker and BERT
+    text encoder, built from configs with a word-level tokenizer over the
+    synthetic vocabulary, so the real pre/post-processing code runs offline
+    """
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import (
+        BertConfig, BertModel, BitImageProcessor, Dinov2Config, Dinov2Model,
+        PreTrainedTokenizerFast, XLMRobertaConfig, XLMRobertaForSequenceClassification
+    )
+
+    torch.manual_seed(0)
+    vocab = {token: i for i, token in enumerate(["[PAD]", "[UNK]", "[CLS]", "[SEP]"] + WORDS)}
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        pair="[CLS] $A [SEP] $B [SEP]",
+        special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])]
+    )
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend,
+        pad_token="[PAD]", unk_token="[UNK]", cls_token="[CLS]", sep_token="[SEP]",
+        model_max_length=256,
+        model_input_names=["input_ids", "attention_mask"]
+    )
+    text_config = dict(
+        vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=300, pad_token_id=vocab["[PAD]"]
+    )
+
+    def prepare(model):
+        return extractor._apply_precision(model.to(extractor.device).eval())
+
+    with extractor._load_lock:
+        extractor.backend = "torch"
+        extractor._img_processor = BitImageProcessor(
+            size={"shortest_edge": 64},
+            crop_size={"height": 56, "width": 56},
+            image_mean=[0.485, 0.456, 0.406],
+            image_std=[0.229, 0.224, 0.225]
+        )
+        extractor._img_model = prepare(Dinov2Model(Dinov2Config(
+            hidden_size=32, num_hidden_layers=2, num_attention_heads=2, mlp_ratio=2,
+            image_size=56, patch_size=14
+        )))
+        extractor._tokenizer = tokenizer
+        extractor._reranker = prepare(XLMRobertaForSequenceClassification(XLMRobertaConfig(num_labels=1, **text_config)))
+        extractor._text_tokenizer = tokenizer
+        extractor._text_encoder = prepare(BertModel(BertConfig(**text_config)))
+        extractor._image_model_loaded = extractor._reranker_loaded = extractor._text_encoder_loaded = True
+
+    # Stored vectors and match versions are filed under these names
+    FeatureExtractor.DINO_MODEL = "tiny-random/dinov2"
+    FeatureExtractor.RERANKER_MODEL = "tiny-random/xlm-roberta-reranker"
+    settings.TEXT_EMBEDDING_MODEL = "tiny-random/bert"
+    image_processor._rembg_session = PassthroughRembgSession()
+
+
+# ----------------------------------------------------------------------
+# Timing
+# ----------------------------------------------------------------------
+
+async def measure(fn, repeat: int, warmup: int = 1) -> dict:
+    """Call fn (sync or async) warmup + repeat times; latency summary in ms"""
+    timings = []
+    for run in range(warmup + repeat):
+        start = time.perf_counter()
+        result = fn()
+        if inspect.isawaitable(result):
+            await result
+        if run >= warmup:
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "runs": len(timings),
+        "median_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 3),
+        "min_ms": round(timings[0], 3)
+    }
+
+
+def report(name: str, stats: dict):
+    print(f"   {name:<42} {stats['median_ms']:>10.2f} ms  (p95 {stats['p95_ms']:.2f}, n={stats['runs']})")
+
+
+# ----------------------------------------------------------------------
+# Benchmarks
+# ----------------------------------------------------------------------
+
+async def bench_upload(samples, args, db) -> dict:
+    print("\n📤 Upload")
+    results = {}
+    sample = samples[0]
+
+    results["process_and_save_image"] = await measure(
+        lambda: process_and_save_image(upload_file(sample["image"]), "found", "LF-BENCH-UPLOAD"),
+        args.repeat
+    )
+    report("process_and_save_image", results["process_and_save_image"])
+
+    counter = iter(range(10 ** 9))
+
+    async def upload_item():
+        item = samples[next(counter) % len(samples)]
+        await handle_item_upload(
+            ItemType.FOUND, item["item_name"], item["description"], "bench@example.com",
+            upload_file(item["image"]), db
+        )
+
+    results["handle_item_upload"] = await measure(upload_item, args.repeat)
+    report("handle_item_upload (image + features + DB)", results["handle_item_upload"])
+    return results
+
+
+async def bench_features(samples, args) -> dict:
+    print("\n🧮 FeatureExtractor")
+    rng = np.random.default_rng(1)
+    images = [Image.open(io.BytesIO(s["image"])).convert("RGB").resize(image_processor.IMAGE_SIZE) for s in samples[:8]]
+    texts = [s["description"] for s in samples]
+    query_img, query_text = images[0], texts[0]
+
+    query_des = feature_extractor.compute_sift_descriptors(query_img)
+    candidate_des = [feature_extractor.compute_sift_descriptors(img) for img in images] * (args.candidates // len(images) + 1)
+    candidate_des = candidate_des[:args.candidates]
+    query_emb = feature_extractor.extract_dino_embedding(query_img)
+    candidate_embs = list(rng.standard_normal((args.candidates, len(query_emb))).astype(np.float32))
+    candidate_texts = [texts[i % len(texts)] for i in range(args.candidates)]
+    survivors = min(args.candidates, settings.CASCADE_TOP_M)
+
+    cases = {
+        "extract_dino_embedding": lambda: feature_extractor.extract_dino_embedding(query_img),
+        "extract_dino_embeddings[8]": lambda: feature_extractor.extract_dino_embeddings(images),
+        "extract_text_embeddings[32]": lambda: feature_extractor.extract_text_embeddings(texts[:32]),
+        "compute_sift_descriptors": lambda: feature_extractor.compute_sift_descriptors(query_img),
+        f"match_sift_batch[{args.candidates}]": lambda: feature_extractor.match_sift_batch(query_des, candidate_des),
+        "match_sift_descriptors": lambda: feature_extractor.match_sift_descriptors(query_des, candidate_des[1]),
+        f"extract_text_similarity_batch[{survivors}]":
+            lambda: feature_extractor.extract_text_similarity_batch(query_text, candidate_texts[:survivors]),
+        "extract_item_name_similarity": lambda: feature_extractor.extract_item_name_similarity("wallet", query_text),
+        "extract_color_match": lambda: feature_extractor.extract_color_match(query_text, texts[1]),
+        "extract_all_features (one pair)": lambda: feature_extractor.extract_all_features(
+            images[0], images[1], query_text, texts[1], samples[0]["item_name"]
+        ),
+        f"extract_cheap_features_batch[{args.candidates}]": lambda: feature_extractor.extract_cheap_features_batch(
+            query_img, [None] * args.candidates, query_text, candidate_texts, samples[0]["item_name"],
+            query_emb=query_emb, candidate_embs=candidate_embs
+        ),
+        f"add_expensive_features_batch[{survivors}]": lambda: feature_extractor.add_expensive_features_batch(
+            np.zeros((survivors, 5)), query_img, [None] * survivors, query_text, candidate_texts[:survivors],
+            query_des=query_des, candidate_des=candidate_des[:survivors]
+        )
+    }
+
+    results = {}
+    for name, fn in cases.items():
+        results[name] = await measure(fn, args.repeat)
+        report(name, results[name])
+    return results
+
+
+async def bench_ml(args) -> dict:
+    print("\n🌲 MLService")
+    features = np.random.default_rng(2).random((args.candidates, 5))
+    ml_service.ensure_loaded()
+
+    results = {
+        f"predict x{args.candidates}": await measure(lambda: [ml_service.predict(row) for row in features], args.repeat),
+        f"batch_predict[{args.candidates}]": await measure(lambda: ml_service.batch_predict(features), args.repeat)
+    }
+    for name, stats in results.items():
+        report(name, stats)
+    return results
+
+
+async def grow_inventory(db, samples, target: int, rng: np.random.Generator) -> list:
+    """Upload items (alternating lost/found) until the inventory holds target items"""
+    count = db.query(Item).count()
+    tokens = []
+    while count < target:
+        item = samples[rng.integers(len(samples))]
+        item_type = ItemType.LOST if count % 2 else ItemType.FOUND
+        _, token = await handle_item_upload(
+            item_type, item["item_name"], item["description"], "bench@example.com",
+            upload_file(item["image"]), db
+        )
+        if item_type == ItemType.LOST:
+            tokens.append(token)
+        count += 1
+    return tokens
+
+
+async def bench_search(samples, args, db) -> list:
+    print("\n🔎 Search (end to end)")
+    rng = np.random.default_rng(3)
+    lost_tokens = []
+    results = []
+    for size in sorted(args.sizes):
+        start = time.perf_counter()
+        lost_tokens += await grow_inventory(db, samples, size, rng)
+        print(f"   📦 inventory {size} built in {time.perf_counter() - start:.1f}s")
+
+        queries = [lost_tokens[i] for i in rng.choice(len(lost_tokens), min(args.queries, len(lost_tokens)), replace=False)]
+        stages = []
+
+        async def full_search(token):
+            result = await search_matches(token, top_k=5, refresh=True, db=db)
+            stages.append(result.get("stages"))
+
+        full = await measure_each(queries, full_search)
+        incremental = await measure_each(queries, lambda token: search_matches(token, top_k=5, refresh=False, db=db))
+        stage1 = [s["stage1"]["seconds"] * 1000 for s in stages if s]
+        stage2 = [s["stage2"]["seconds"] * 1000 for s in stages if s]
+
+        entry = {
+            "size": size,
+            "full": full,
+            "incremental": incremental,
+            "stage1_median_ms": round(statistics.median(stage1), 3) if stage1 else None,
+            "stage2_median_ms": round(statistics.median(stage2), 3) if stage2 else None
+        }
+        results.append(entry)
+        report(f"search full @ {size}", full)
+        report(f"search incremental @ {size}", incremental)
+    return results
+
+
+async def measure_each(tokens, fn) -> dict:
+    """One timed call per query token (no warm-up: every query is different)"""
+    iterator = iter(tokens)
+    return await measure(lambda: fn(next(iterator)), repeat=len(tokens), warmup=0)
+
+
+# ----------------------------------------------------------------------
+# Output
+# ----------------------------------------------------------------------
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def flatten(results: dict) -> dict:
+    """name -> median_ms for every timed case, for baseline comparison"""
+    flat = {}
+    for group in ("upload", "features", "ml"):
+        for name, stats in results.get(group, {}).items():
+            flat[f"{group}/{name}"] = stats["median_ms"]
+    for entry in results.get("search", []):
+        for mode in ("full", "incremental"):
+            flat[f"search/{mode}@{entry['size']}"] = entry[mode]["median_ms"]
+    return flat
+
+
+def compare(results: dict, baseline_path: Path):
+    baseline = json.loads(baseline_path.read_text())
+    old, new = flatten(baseline), flatten(results)
+    print(f"\n📊 vs {baseline_path.name} ({baseline['meta']['commit']} -> {results['meta']['commit']})")
+    for name in new:
+        if name in old and old[name]:
+            print(f"   {name:<55} {old[name]:>10.2f} -> {new[name]:>10.2f} ms  ({new[name] / old[name]:.2f}x)")
+
+
+async def run(args) -> dict:
+    logging.basicConfig(level=logging.WARNING)
+    if args.models == "tiny":
+        install_tiny_models(feature_extractor)
+    ml_service.model_dir = REPO_DIR / "ml_models"
+    Base.metadata.create_all(bind=engine)
+
+    rng = np.random.default_rng(0)
+    samples = [synthetic_item(i, rng) for i in range(args.samples)]
+    db = SessionLocal()
+    try:
+        results = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "torch": torch.__version__,
+                "device": feature_extractor.device,
+                "models": args.models,
+                "backend": feature_extractor.backend,
+                "precision": feature_extractor.precision,
+                "args": vars(args)
+            },
+            "features": await bench_features(samples, args),
+            "ml": await bench_ml(args),
+            "search": await bench_search(samples, args, db),
+            "upload": await bench_upload(samples, args, db)
+        }
+    finally:
+        db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline upload/search benchmark")
+    parser.add_argument("--models", choices=["tiny", "real"], default="tiny")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000], help="Inventory sizes for search")
+    parser.add_argument("--queries", type=int, default=10, help="Searches per inventory size")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per micro-benchmark")
+    parser.add_argument("--candidates", type=int, default=100, help="Candidates per batched feature call")
+    parser.add_argument("--samples", type=int, default=64, help="Distinct synthetic items")
+    parser.add_argument("--json", help="Results file (default: bench_pipeline_<commit>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    out_path = START_DIR / (args.json or f"bench_pipeline_{results['meta']['commit']}.json")
+    out_path.write_text(json.dumps(results, indent=2))
+    print(f"\n✅ Results written to {out_path}")
+
+    if args.baseline:
+        compare(results, START_DIR / args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Database share of the search path at growing inventory sizes
+
+Builds a throwaway SQLite database (and vector index) per size with random
+embeddings, then times each phase of a search that touches the DB against
+the in-memory phases around it:
+
+    index      vector index search (SEARCH_CANDIDATES)          compute
+    fetch      candidate Items, CANDIDATE_COLUMNS only           db
+    vectors    feature-store rows -> float32 matrix              db
+    stage1     cosine of the query against the candidates        compute
+    memo       stored Match rows for the candidates              db
+    write      upsert CASCADE_TOP_M Match rows + commit          db
+    read       merged top-K from the stored rows                 db
+
+plus the old ORM path for comparison (full Item entities, one
+db.add(Match) per row). Model inference is not run; pass --model-ms with
+a measured per-search model time to see the DB share of a real search.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_search_db
+    python -m benchmarks.bench_search_db --sizes 1000 10000 --queries 50 --model-ms 900
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a scratch SQLite file before anything opens the engine
+_workdir = Path(tempfile.mkdtemp(prefix="bench_search_db_"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir / 'bench.db'}"
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.core.database import Base
+from app.models.database_models import Item, ItemType, Match
+from app.services.feature_store import feature_store
+from app.services.matching_service import (
+    candidate_query, get_precomputed_matches, load_match_memo, upsert_matches
+)
+from app.services.vector_index import VectorIndex
+
+MODEL_VERSION = "benchmark"
+DB_PHASES = ("fetch", "vectors", "memo", "write", "read")
+COMPUTE_PHASES = ("index", "stage1")
+
+
+def build_inventory(db, size: int, dim: int, rng: np.random.Generator) -> VectorIndex:
+    """Insert size items (half lost, half found) with random DINOv2 vectors"""
+    chunk = 5000
+    index = VectorIndex(_workdir / f"index_{size}", "dino_found")
+    for start in range(0, size, chunk):
+        rows = [
+            {
+                "tracking_token": f"bench-{size}-{i}",
+                "item_type": ItemType.LOST if i % 2 else ItemType.FOUND,
+                "item_name": f"item {i % 500}",
+                "description": f"benchmark item number {i} with a short description",
+                "image_path": f"uploads/bench/{i}.jpg",
+                "contact_info": "bench@example.com"
+            }
+            for i in range(start, min(start + chunk, size))
+        ]
+        db.execute(insert(Item), rows)
+        ids = [row[0] for row in db.query(Item.id).filter(Item.tracking_token.in_([r["tracking_token"] for r in rows]))]
+        vectors = rng.standard_normal((len(ids), dim)).astype(np.float32)
+        feature_store.put_many(db, ids, "dino", vectors)
+        db.commit()
+
+        found = [
+            (item_id, vector) for item_id, vector, row in zip(ids, vectors, rows)
+            if row["item_type"] == ItemType.FOUND
+        ]
+        if found:
+            index.add_many([i for i, _ in found], np.vstack([v for _, v in found]), save=False)
+    index.save()
+    return index
+
+
+def match_rows(query_item, candidates, rng):
+    return [
+        {
+            "lost_item_id": query_item.id,
+            "found_item_id": candidate.id,
+            "overall_score": float(score),
+            "dino_similarity": float(score),
+            "sift_similarity": 0.0,
+            "text_similarity": 0.5,
+            "item_name_similarity": 0.5,
+            "color_match": 1.0,
+            "is_match": int(score > 0.9),
+            "confidence": float(score * 100),
+            "model_version": MODEL_VERSION
+        }
+        for candidate, score in zip(candidates, rng.random(len(candidates)))
+    ]
+
+
+def run_size(size: int, args) -> dict:
+    engine = create_engine(f"sqlite:///{_workdir / f'bench_{size}.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    rng = np.random.default_rng(0)
+
+    start = time.perf_counter()
+    index = build_inventory(db, size, args.dim, rng)
+    print(f"\n📦 {size} items built in {time.perf_counter() - start:.1f}s")
+
+    lost_ids = [row[0] for row in db.query(Item.id).filter(Item.item_type == ItemType.LOST)]
+    timings = {phase: [] for phase in DB_PHASES + COMPUTE_PHASES + ("legacy_fetch", "legacy_write")}
+
+    for query_id in random.Random(0).sample(lost_ids, min(args.queries, len(lost_ids))):
+        query_item = db.get(Item, query_id)
+        query_vector = feature_store.get(db, query_id, "dino").astype(np.float32)
+
+        t = time.perf_counter()
+        hit_ids = [item_id for item_id, _ in index.search(query_vector, settings.SEARCH_CANDIDATES)]
+        timings["index"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        candidates = candidate_query(db).filter(Item.id.in_(hit_ids)).all()
+        timings["fetch"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        ids, matrix = feature_store.get_matrix(db, [c.id for c in candidates], "dino")
+        timings["vectors"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        scores = matrix @ query_vector / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector))
+        survivors = [candidates[i] for i in np.argsort(-scores)[:settings.CASCADE_TOP_M]]
+        timings["stage1"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        load_match_memo(db, query_item, ids, MODEL_VERSION)
+        timings["memo"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        upsert_matches(db, match_rows(query_item, survivors, rng))
+        db.commit()
+        timings["write"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        get_precomputed_matches(db, query_item, 5, MODEL_VERSION)
+        timings["read"].append(time.perf_counter() - t)
+
+        # The previous ORM path, for comparison
+        db.expire_all()
+        t = time.perf_counter()
+        db.query(Item).filter(Item.id.in_(hit_ids)).all()
+        timings["legacy_fetch"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        for row in match_rows(query_item, survivors, rng):
+            db.add(Match(**dict(row, model_version=f"legacy-{query_id}")))
+        db.commit()
+        timings["legacy_write"].append(time.perf_counter() - t)
+
+    db.close()
+    engine.dispose()
+
+    medians = {phase: statistics.median(values) * 1000 for phase, values in timings.items()}
+    db_ms = sum(medians[p] for p in DB_PHASES)
+    compute_ms = sum(medians[p] for p in COMPUTE_PHASES) + args.model_ms
+    return {
+        "size": size,
+        "queries": len(timings["index"]),
+        "median_ms": {phase: round(ms, 3) for phase, ms in medians.items()},
+        "db_ms": round(db_ms, 3),
+        "non_db_ms": round(compute_ms, 3),
+        "db_share": round(db_ms / (db_ms + compute_ms), 4) if db_ms + compute_ms else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DB share of the search path")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=20, help="Searches per size")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimension")
+    parser.add_argument("--model-ms", type=float, default=0.0, help="Measured model time per search")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = [run_size(size, args) for size in args.sizes]
+
+    print(f"\n{'size':>8} {'fetch':>8} {'vectors':>8} {'memo':>8} {'write':>8} {'read':>8} "
+          f"{'db ms':>8} {'share':>7} {'old fetch':>10} {'old write':>10}")
+    for r in results:
+        m = r["median_ms"]
+        print(f"{r['size']:>8} {m['fetch']:>8.2f} {m['vectors']:>8.2f} {m['memo']:>8.2f} {m['write']:>8.2f} "
+              f"{m['read']:>8.2f} {r['db_ms']:>8.2f} {r['db_share'] * 100:>6.1f}% "
+              f"{m['legacy_fetch']:>10.2f} {m['legacy_write']:>10.2f}")
+    if not args.model_ms:
+        print("\n(share excludes model inference; pass --model-ms to include it)")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
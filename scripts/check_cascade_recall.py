@@ -0,0 +1,109 @@
+"""
+Offline recall check for the two-stage matching cascade
+
+For a sample of stored items, scores every retrieved candidate with the
+full pipeline (cascade off) and checks how many of the full-pipeline
+matches survive stage 1, counting the CASCADE_TEXT_TOP_M text survivors
+exactly as search does. It also suggests the highest stage-1 threshold
+that keeps the target recall, and can write it to
+MODEL_DIR/cascade_threshold.txt, where MLService picks it up.
+
+Usage (from the repo root):
+    python -m scripts.check_cascade_recall --limit 200
+    python -m scripts.check_cascade_recall --target-recall 0.99 --write
+"""
+from app.config import settings
+from app.core.database import SessionLocal
+from app.models.database_models import Item, ItemType
+from app.services.image_processor import load_clean_image
+from app.services.matching_service import (
+    cascade_survivors, get_dino_embedding, get_text_embedding, retrieve_candidates, score_candidates,
+    select_survivors, text_cosine_scores
+)
+from app.services.ml_service import ml_service
+from pathlib import Path
+import numpy as np
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascade recall vs full scoring")
+    parser.add_argument("--limit", type=int, default=100, help="Query items to sample")
+    parser.add_argument("--top-m", type=int, default=settings.CASCADE_TOP_M)
+    parser.add_argument("--text-top-m", type=int, default=settings.CASCADE_TEXT_TOP_M)
+    parser.add_argument("--target-recall", type=float, default=0.99)
+    parser.add_argument("--write", action="store_true", help="Write the suggested threshold")
+    args = parser.parse_args()
+
+    ml_service.ensure_loaded()
+    db = SessionLocal()
+    try:
+        queries = db.query(Item).order_by(Item.id.desc()).limit(args.limit).all()
+
+        runs = []
+        for query_item in queries:
+            query_img = load_clean_image(query_item.image_path)
+            if query_img is None:
+                continue
+            candidate_type = ItemType.FOUND if query_item.item_type == ItemType.LOST else ItemType.LOST
+            query_embedding = get_dino_embedding(db, query_item, query_img)
+            query_text_embedding = get_text_embedding(db, query_item)
+            candidates, _ = retrieve_candidates(db, candidate_type, query_embedding, query_text_embedding)
+            if not candidates:
+                continue
+
+            full = score_candidates(
+                db, query_item, query_img, query_embedding, candidates,
+                cascade=False, query_text_embedding=query_text_embedding
+            )
+            positives = np.asarray([prediction for prediction, _ in full["predictions"]], dtype=bool)
+            text_scores = text_cosine_scores(db, query_text_embedding, full["stage1_items"])
+            runs.append((full["stage1_scores"], text_scores, positives))
+            print(f"   {query_item.tracking_token}: {len(positives)} candidates, {positives.sum()} matches")
+    finally:
+        db.close()
+
+    total_positives = sum(int(p.sum()) for _, _, p in runs)
+    print(f"\n📋 {len(runs)} queries, {total_positives} full-pipeline matches")
+    if total_positives == 0:
+        print("No matches to measure recall against")
+        return
+
+    def evaluate(threshold):
+        kept, survivors = 0, 0
+        for scores, text_scores, positives in runs:
+            selected = cascade_survivors(scores, text_scores, args.top_m, threshold, args.text_top_m)
+            kept += int(positives[selected].sum())
+            survivors += len(selected)
+        return kept / total_positives, survivors / len(runs)
+
+    recall, survivors = evaluate(ml_service.cascade_threshold)
+    print(f"Current config (top-M {args.top_m}, text top-M {args.text_top_m}, "
+          f"threshold {ml_service.cascade_threshold}): "
+          f"recall {recall * 100:.2f}%, {survivors:.1f} survivors/query")
+
+    # Highest threshold that still keeps the target share of positives;
+    # the ones a text slot keeps anyway do not have to pass it
+    needed = []
+    for scores, text_scores, positives in runs:
+        rescued = np.zeros(len(positives), dtype=bool)
+        if text_scores is not None:
+            rescued[select_survivors(text_scores, args.text_top_m)] = True
+        needed.append(scores[positives & ~rescued])
+    needed = np.sort(np.concatenate(needed))
+    if len(needed) == 0:
+        print("Every match is kept by a text slot; no threshold needed")
+        return
+    drop = int(np.floor((1 - args.target_recall) * total_positives))
+    suggested = float(needed[min(drop, len(needed) - 1)])
+    recall, survivors = evaluate(suggested)
+    print(f"Suggested threshold {suggested:.4f}: recall {recall * 100:.2f}%, {survivors:.1f} survivors/query")
+
+    if args.write:
+        path = Path(settings.MODEL_DIR) / "cascade_threshold.txt"
+        path.write_text(f"{suggested}")
+        print(f"✅ Written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Measure how much a reduced-precision mode shifts the XGBoost match decisions
+
+Runs a labeled pair set through every precision mode, scores it with
+MLService.predict and compares each mode against fp32.
+
+The pair set is a CSV with the columns
+    image1,image2,text1,text2,item_name,label
+where image paths are relative to static/ (like Item.image_path) and
+label is 1 for a true match, 0 otherwise.
+
+Usage (from the repo root):
+    python -m scripts.check_precision_drift pairs.csv
+    python -m scripts.check_precision_drift pairs.csv --modes fp32 int8 --backend torch
+"""
+from app.services.feature_extractor import FeatureExtractor
+from app.services.image_processor import load_clean_image
+from app.services.ml_service import ml_service
+from typing import Dict, List
+import numpy as np
+import argparse
+import csv
+import io
+import time
+import torch
+
+FEATURES = ["dino", "sift", "text", "name", "color"]
+
+
+def model_size_mb(module) -> float:
+    """Serialized size of a torch module's weights (0 for ONNX sessions)"""
+    if not isinstance(module, torch.nn.Module):
+        return 0.0
+    buffer = io.BytesIO()
+    torch.save(module.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def load_pairs(path: str) -> List[Dict]:
+    with open(path, newline="", encoding="utf-8") as f:
+        pairs = list(csv.DictReader(f))
+    for pair in pairs:
+        pair["label"] = int(pair["label"])
+    return pairs
+
+
+def score_pairs(extractor: FeatureExtractor, pairs: List[Dict]) -> Dict:
+    """Features, probabilities and decisions for every pair"""
+    features, probas, decisions = [], [], []
+    start = time.perf_counter()
+    for pair in pairs:
+        img1 = load_clean_image(pair["image1"])
+        img2 = load_clean_image(pair["image2"])
+        if img1 is None or img2 is None:
+            raise FileNotFoundError(f"Missing image in pair: {pair['image1']}, {pair['image2']}")
+        row = extractor.extract_all_features(
+            img1=img1,
+            img2=img2,
+            text1=pair["text1"],
+            text2=pair["text2"],
+            item_name=pair["item_name"]
+        )
+        prediction, confidence = ml_service.predict(row)
+        features.append(row)
+        probas.append(confidence)
+        decisions.append(prediction)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "features": np.vstack(features),
+        "probas": np.asarray(probas),
+        "decisions": np.asarray(decisions),
+        "seconds": elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XGBoost decision drift per precision mode")
+    parser.add_argument("pairs", help="CSV of labeled pairs")
+    parser.add_argument("--modes", nargs="+", choices=["fp32", "bf16", "int8"], default=["fp32", "bf16", "int8"])
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.pairs)
+    labels = np.asarray([p["label"] for p in pairs])
+    modes = ["fp32"] + [m for m in args.modes if m != "fp32"]
+    print(f"📋 {len(pairs)} pairs, threshold {ml_service.threshold:.4f}, backend {args.backend}")
+
+    baseline = None
+    for mode in modes:
+        extractor = FeatureExtractor(backend=args.backend, precision=mode)
+        if extractor.precision != mode:
+            print(f"\n=== {mode} === not available here (runs as {extractor.precision}), skipped")
+            continue
+        result = score_pairs(extractor, pairs)
+        size = model_size_mb(extractor.img_model) + model_size_mb(extractor.reranker)
+        accuracy = float(np.mean(result["decisions"] == labels))
+
+        print(f"\n=== {mode} ===")
+        print(f"   Accuracy:      {accuracy * 100:.2f}%")
+        print(f"   Time:          {result['seconds']:.2f}s ({result['seconds'] / len(pairs) * 1000:.1f} ms/pair)")
+        if size:
+            print(f"   Weights:       {size:.0f} MB")
+
+        if baseline is None:
+            baseline = result
+            continue
+
+        flips = int(np.sum(result["decisions"] != baseline["decisions"]))
+        proba_diff = np.abs(result["probas"] - baseline["probas"])
+        feature_diff = np.mean(np.abs(result["features"] - baseline["features"]), axis=0)
+        print(f"   Decision flips vs fp32: {flips}/{len(pairs)} ({flips / len(pairs) * 100:.2f}%)")
+        print(f"   |proba - fp32|: mean {proba_diff.mean():.4f}, max {proba_diff.max():.4f}")
+        print("   Mean |feature - fp32|: " + ", ".join(
+            f"{name} {diff:.4f}" for name, diff in zip(FEATURES, feature_diff)
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Create indexes declared on the models that an existing database lacks
+
+Base.metadata.create_all only creates missing tables, so indexes added to
+existing tables (e.g. ix_items_type_id, ix_matches_is_match_id)
+have to be created here once after upgrading.
+
+Usage (from the repo root):
+    python -m scripts.create_indexes
+"""
+from sqlalchemy import inspect
+from app.core.database import Base, engine
+import app.models.database_models  # noqa: F401  (registers the tables)
+
+
+def main():
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            index.create(bind=engine)
+            print(f"✅ Created {index.name} on {table.name}")
+    print("Indexes up to date")
+
+
+if __name__ == "__main__":
+    main()
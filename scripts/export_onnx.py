@@ -0,0 +1,101 @@
+"""
+Export DINOv2 and the BGE Reranker to ONNX under MODEL_DIR/onnx
+and check the ONNX Runtime outputs against PyTorch
+
+Usage (from the repo root):
+    python -m scripts.export_onnx
+    python -m scripts.export_onnx --models reranker --skip-check
+    python -m scripts.export_onnx --check-only
+    python -m scripts.export_onnx --int8   # also write *.int8.onnx for MODEL_PRECISION=int8
+"""
+from app.services.feature_extractor import FeatureExtractor
+from app.services.onnx_backend import export_dinov2, export_reranker, quantize_onnx_model, DINO_ONNX_PATH, RERANKER_ONNX_PATH
+from pathlib import Path
+from PIL import Image
+from typing import List
+import numpy as np
+import argparse
+import sys
+
+SAMPLE_TEXTS = [
+    ("black leather wallet", "found a black leather wallet near the library"),
+    ("black leather wallet", "blue water bottle with stickers"),
+    ("iphone 13 red case", "red phone found in the cafeteria"),
+    ("student id card", "lost my id card at the bus stop, name on the front"),
+    ("house keys", "set of keys on a yellow keychain"),
+    ("umbrella", "কালো ছাতা পাওয়া গেছে"),
+]
+
+
+def sample_images(limit: int = 8) -> List[Image.Image]:
+    """Stored uploads if there are any, otherwise random noise images"""
+    paths = sorted(Path("static/uploads").glob("*/*.png"))[:limit]
+    if paths:
+        return [Image.open(p).convert("RGB") for p in paths]
+    rng = np.random.default_rng(0)
+    return [
+        Image.fromarray(rng.integers(0, 256, (448, 448, 3), dtype=np.uint8))
+        for _ in range(limit)
+    ]
+
+
+def check_parity(models: List[str], tolerance: float, precision: str = "fp32") -> bool:
+    """Compare ONNX Runtime outputs with PyTorch on sample inputs"""
+    torch_fx = FeatureExtractor(backend="torch", precision="fp32")
+    onnx_fx = FeatureExtractor(backend="onnx", precision=precision)
+    ok = True
+
+    if "dinov2" in models:
+        images = sample_images()
+        expected = torch_fx.extract_dino_embeddings(images)
+        actual = onnx_fx.extract_dino_embeddings(images)
+        diff = float(np.max(np.abs(expected - actual)))
+        cosine = float(np.min(np.sum(expected * actual, axis=1)))
+        passed = diff <= tolerance
+        ok &= passed
+        print(f"{'✅' if passed else '❌'} DINOv2: max |diff| = {diff:.2e}, min cosine = {cosine:.6f} ({len(images)} images)")
+
+    if "reranker" in models:
+        for query in sorted({q for q, _ in SAMPLE_TEXTS}):
+            texts = [t for q, t in SAMPLE_TEXTS if q == query] + [t for q, t in SAMPLE_TEXTS if q != query]
+            expected = torch_fx.extract_text_similarity_batch(query, texts)
+            actual = onnx_fx.extract_text_similarity_batch(query, texts)
+            diff = float(np.max(np.abs(expected - actual)))
+            passed = diff <= tolerance
+            ok &= passed
+            print(f"{'✅' if passed else '❌'} Reranker '{query}': max |score diff| = {diff:.2e}")
+
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export models to ONNX")
+    parser.add_argument("--models", nargs="+", choices=["dinov2", "reranker"], default=["dinov2", "reranker"])
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--tolerance", type=float, default=1e-3)
+    parser.add_argument("--skip-check", action="store_true", help="Do not compare against PyTorch")
+    parser.add_argument("--check-only", action="store_true", help="Only run the parity check")
+    parser.add_argument("--int8", action="store_true", help="Also write dynamically quantized int8 graphs")
+    args = parser.parse_args()
+
+    if not args.check_only:
+        extractor = FeatureExtractor(backend="torch", precision="fp32")
+        if "dinov2" in args.models:
+            size = extractor.img_processor.crop_size["height"]
+            export_dinov2(extractor.img_model, DINO_ONNX_PATH, image_size=size, opset=args.opset)
+            print(f"✅ DINOv2 exported to {DINO_ONNX_PATH}")
+        if "reranker" in args.models:
+            export_reranker(extractor.reranker, extractor.tokenizer, RERANKER_ONNX_PATH, opset=args.opset)
+            print(f"✅ Reranker exported to {RERANKER_ONNX_PATH}")
+        if args.int8:
+            for model in args.models:
+                path = DINO_ONNX_PATH if model == "dinov2" else RERANKER_ONNX_PATH
+                print(f"✅ Quantized copy written to {quantize_onnx_model(path)}")
+
+    if not args.skip_check and not check_parity(args.models, args.tolerance):
+        print("❌ ONNX outputs differ from PyTorch beyond tolerance")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Move embeddings from the old items.dino_feature / items.text_embedding
+LONGTEXT columns into the item_features table
+
+The old columns held base64 float16 vectors. Text
+vectors are filed under the current TEXT_EMBEDDING_MODEL, so run this
+before changing that setting.
+
+Usage (from the repo root):
+    python -m scripts.migrate_feature_store
+    python -m scripts.migrate_feature_store --drop-columns
+"""
+from sqlalchemy import inspect, text
+from app.core.database import Base, SessionLocal, engine
+from app.services.feature_store import feature_store
+from typing import Optional
+import numpy as np
+import argparse
+import base64
+
+LEGACY_COLUMNS = {"dino_feature": "dino", "text_embedding": "text"}
+
+
+def deserialize_embedding(data: Optional[str]) -> Optional[np.ndarray]:
+    """
+    Decode a legacy base64 float16 embedding
+
+    Returns:
+        float32 vector, or None if nothing is stored or it is unreadable
+    """
+    if not data:
+        return None
+    try:
+        return np.frombuffer(base64.b64decode(data), dtype=np.float16).astype(np.float32)
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy LONGTEXT embeddings into item_features")
+    parser.add_argument("--chunk", type=int, default=1000, help="Items per transaction")
+    parser.add_argument("--drop-columns", action="store_true", help="Drop the old columns afterwards")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    present = {column["name"] for column in inspect(engine).get_columns("items")}
+    columns = [name for name in LEGACY_COLUMNS if name in present]
+    if not columns:
+        print("No legacy embedding columns found, nothing to migrate")
+        return
+
+    db = SessionLocal()
+    try:
+        copied = {name: 0 for name in columns}
+        last_id = 0
+        while True:
+            rows = db.execute(
+                text(f"SELECT id, {', '.join(columns)} FROM items WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": args.chunk}
+            ).fetchall()
+            if not rows:
+                break
+            for offset, name in enumerate(columns, start=1):
+                ids, vectors = [], []
+                for row in rows:
+                    vector = deserialize_embedding(row[offset])
+                    if vector is not None:
+                        ids.append(row[0])
+                        vectors.append(vector)
+                feature_store.put_many(db, ids, LEGACY_COLUMNS[name], vectors)
+                copied[name] += len(ids)
+            db.commit()
+            last_id = rows[-1][0]
+            print(f"   migrated items up to id {last_id}")
+
+        for name, count in copied.items():
+            print(f"✅ {name}: {count} vectors copied")
+
+        if args.drop_columns:
+            for name in columns:
+                db.execute(text(f"ALTER TABLE items DROP COLUMN {name}"))
+            db.commit()
+            print(f"🗑️ Dropped {', '.join(columns)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
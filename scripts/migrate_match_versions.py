@@ -0,0 +1,48 @@
+"""
+Add matches.model_version and the unique (lost_item_id, found_item_id,
+model_version) index to an existing database
+
+Rows written before versioning are tagged "legacy". Duplicate pairs,
+which every repeated search used to insert, are collapsed to the newest
+row first so the unique index can be created.
+
+Usage (from the repo root):
+    python -m scripts.migrate_match_versions
+"""
+from sqlalchemy import inspect, text
+from app.core.database import engine
+from app.models.database_models import Match
+
+
+def main():
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("matches")}
+
+    with engine.begin() as conn:
+        if "model_version" not in columns:
+            conn.execute(text(
+                "ALTER TABLE matches ADD COLUMN model_version VARCHAR(64) NOT NULL DEFAULT 'legacy'"
+            ))
+            print("✅ Added matches.model_version")
+
+        deleted = conn.execute(text(
+            "DELETE FROM matches WHERE id NOT IN ("
+            "SELECT keep_id FROM (SELECT MAX(id) AS keep_id FROM matches "
+            "GROUP BY lost_item_id, found_item_id, model_version) AS newest)"
+        )).rowcount
+        print(f"🗑️ Removed {deleted} duplicate match rows")
+
+    constraint = next(c for c in Match.__table__.constraints if c.name == "uq_match_pair_version")
+    existing = {index["name"] for index in inspect(engine).get_indexes("matches")}
+    existing |= {c["name"] for c in inspect(engine).get_unique_constraints("matches")}
+    if constraint.name not in existing:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX {constraint.name} ON matches "
+                f"({', '.join(column.name for column in constraint.columns)})"
+            ))
+        print(f"✅ Created unique index {constraint.name}")
+
+
+if __name__ == "__main__":
+    main()
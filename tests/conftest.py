@@ -0,0 +1,120 @@
+"""
+Test fixtures - scratch SQLite database, offline stand-ins for the models
+
+Run from the repo root:
+    python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Settings are read at import time: point them at scratch storage first
+_scratch = Path(tempfile.mkdtemp(prefix="lostfound_tests_"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_scratch / 'test.db'}"
+os.environ["MODEL_DIR"] = str(_scratch / "ml_models")
+os.environ["MATCH_QUEUE_WORKERS"] = "0"
+os.environ["DINO_BATCH_MAX_SIZE"] = "1"
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import shutil
+import zlib
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.core.database import Base, SessionLocal, engine
+from app.models.database_models import Item, ItemType
+from app.services import vector_index
+from app.services.feature_extractor import feature_extractor
+from app.services.image_cache import image_cache
+from app.services.ml_service import ml_service
+
+
+class FakeClassifier:
+    """XGBoost stand-in: the match probability is the DINOv2 similarity"""
+
+    def predict_proba(self, X):
+        p = np.clip(np.asarray(X, dtype=np.float64)[:, 0], 0.0, 1.0)
+        return np.column_stack([1.0 - p, p])
+
+
+def fake_dino_embeddings(images):
+    vectors = np.vstack([
+        np.asarray(img.convert("RGB").resize((4, 4)), dtype=np.float32).reshape(-1) + 1.0
+        for img in images
+    ])
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fake_text_embeddings(texts, batch_size=32):
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, zlib.crc32(word.encode()) % 64] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Empty database, vector indexes and image cache; cwd holds ./static"""
+    monkeypatch.chdir(tmp_path)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    vector_index._indexes.clear()
+    shutil.rmtree(Path(settings.MODEL_DIR), ignore_errors=True)
+    image_cache.clear()
+
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Deterministic, instant replacements for every model call"""
+    monkeypatch.setattr(feature_extractor, "extract_dino_embeddings", fake_dino_embeddings)
+    monkeypatch.setattr(feature_extractor, "extract_dino_embedding", lambda img: fake_dino_embeddings([img])[0])
+    monkeypatch.setattr(feature_extractor, "extract_text_embeddings", fake_text_embeddings)
+    monkeypatch.setattr(feature_extractor, "extract_text_embedding", lambda text: fake_text_embeddings([text])[0])
+    monkeypatch.setattr(
+        feature_extractor, "extract_text_similarity_batch",
+        lambda query, texts, batch_size=None: np.full(len(texts), 0.5, dtype=np.float32)
+    )
+    monkeypatch.setattr(feature_extractor, "compute_sift_descriptors", lambda img: None)
+    monkeypatch.setattr(ml_service, "model", FakeClassifier())
+    monkeypatch.setattr(ml_service, "model_hash", "test")
+    monkeypatch.setattr(ml_service, "threshold", 0.5)
+    monkeypatch.setattr(ml_service, "cascade_threshold", None)
+    monkeypatch.setattr(ml_service, "_loaded", True)
+
+
+@pytest.fixture
+def make_item(db, tmp_path):
+    """Insert an item with a solid-colour image and no stored features"""
+    counter = iter(range(10 ** 6))
+
+    def make(item_type: ItemType, item_name: str = "wallet", description: str = "black leather wallet",
+             color=(20, 20, 20)) -> Item:
+        n = next(counter)
+        image_path = f"uploads/{item_type.value}/item{n}.png"
+        full_path = tmp_path / "static" / image_path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        Image.new("RGB", (64, 64), color).save(full_path)
+
+        item = Item(
+            tracking_token=f"LF-TEST-{n:06d}",
+            item_type=item_type,
+            item_name=item_name,
+            description=description,
+            image_path=image_path,
+            contact_info="test@example.com"
+        )
+        db.add(item)
+        db.commit()
+        return item
+
+    return make
@@ -0,0 +1,32 @@
+import threading
+
+import numpy as np
+
+from app.services.embedding_matrix import EmbeddingMatrix
+
+
+def vectors_for(ids, dim=8):
+    return np.asarray([[i] * dim for i in ids], dtype=np.float32)
+
+
+def test_compaction_keeps_rows_appended_during_the_copy(tmp_path):
+    matrix = EmbeddingMatrix(tmp_path, "dino_found", compact_ratio=1.0)
+    matrix.append(list(range(1000)), vectors_for(range(1000)))
+    matrix.delete(list(range(0, 1000, 2)))
+
+    # A second handle plays another worker appending while compaction copies
+    writer = EmbeddingMatrix(tmp_path, "dino_found", compact_ratio=1.0)
+    appending = threading.Thread(
+        target=lambda: [writer.append([i], vectors_for([i])) for i in range(1000, 1200)]
+    )
+    appending.start()
+    matrix.compact(chunk_rows=16)
+    appending.join()
+
+    matrix.refresh()
+    expected = set(range(1, 1000, 2)) | set(range(1000, 1200))
+    assert set(matrix.ids.tolist()) == expected
+    vectors, _, _ = matrix.snapshot()
+    for item_id in (1, 999, 1199):
+        assert vectors[matrix.row_of[item_id]][0] == item_id
+    assert not list(tmp_path.glob("*.compact"))
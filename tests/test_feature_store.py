@@ -0,0 +1,25 @@
+import numpy as np
+
+from app.core.database import SessionLocal
+from app.models.database_models import ItemFeature, ItemType
+from app.services.feature_store import feature_store
+
+
+def test_concurrent_backfills_of_one_item_both_succeed(db, make_item):
+    item = make_item(ItemType.FOUND)
+    other = SessionLocal()
+    try:
+        # Both workers saw no stored vector before either wrote one
+        assert feature_store.get(db, item.id, "dino") is None
+        assert feature_store.get(other, item.id, "dino") is None
+        other.rollback()  # end the read transaction so SQLite lets db write
+
+        feature_store.put(db, item.id, "dino", np.ones(4))
+        db.commit()
+        feature_store.put(other, item.id, "dino", np.full(4, 2.0))
+        other.commit()
+    finally:
+        other.close()
+
+    assert db.query(ItemFeature).filter(ItemFeature.item_id == item.id).count() == 1
+    assert feature_store.get(db, item.id, "dino").tolist() == [2.0] * 4
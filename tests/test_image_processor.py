@@ -0,0 +1,60 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.services import image_processor
+
+
+@pytest.mark.parametrize("downscale", [True, False])
+def test_clean_and_save_image_applies_exif_orientation(tmp_path, monkeypatch, downscale):
+    monkeypatch.setattr(settings, "REMBG_DOWNSCALE", downscale)
+    # Keep the whole image: an all-foreground mask / an opaque cut-out
+    monkeypatch.setattr(image_processor, "get_rembg_session", lambda: None)
+    monkeypatch.setattr(
+        "rembg.remove",
+        lambda img, session=None, only_mask=False: (
+            Image.new("L", img.size, 255) if only_mask else img.convert("RGBA")
+        )
+    )
+
+    # Landscape pixels, left half red; Orientation 6 means rotate 90 degrees clockwise
+    img = Image.new("RGB", (200, 100), (0, 0, 255))
+    img.paste((255, 0, 0), (0, 0, 100, 100))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", exif=exif)
+
+    out_path = tmp_path / "out.jpg"
+    image_processor.clean_and_save_image(buffer.getvalue(), str(out_path))
+
+    with Image.open(out_path) as result:
+        top, bottom = result.getpixel((224, 40)), result.getpixel((224, 400))
+    # The red half ends up on top once rotated
+    assert top[0] > 200 and top[2] < 60
+    assert bottom[2] > 200 and bottom[0] < 60
+
+
+def test_sift_sidecars_are_cached_outside_static(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(image_processor, "SIFT_DIR", tmp_path / "ml_models" / "sift")
+    descriptors = np.array([[0.4, 254.6] + [7.0] * 126, [300.0] * 128], dtype=np.float32)
+    image_path = "uploads/found/LF-1_abc.jpg"
+
+    assert image_processor.load_sift_descriptors(42, image_path) is None
+    assert image_processor.save_sift_descriptors(42, image_path, descriptors) == 2
+
+    loaded = image_processor.load_sift_descriptors(42, image_path)
+    assert loaded.dtype == np.float32
+    assert loaded[0, :2].tolist() == [0.0, 255.0] and loaded[1, 0] == 255.0
+    assert (tmp_path / "ml_models" / "sift" / "42.npz").exists()
+    assert not (tmp_path / "static").exists()
+
+    # A reused id belongs to another image: the old sidecar is not served
+    assert image_processor.load_sift_descriptors(42, "uploads/found/LF-2_def.jpg") is None
+
+    image_processor.delete_sift_descriptors(42)
+    assert image_processor.load_sift_descriptors(42, image_path) is None
@@ -0,0 +1,55 @@
+from app.models.database_models import ItemFeature, ItemType, Match, SearchWatermark
+from app.services import matching_service
+from app.services.matching_service import run_matching, sync_vector_index
+
+
+def test_first_search_without_stored_features_commits_matches(db, fake_models, make_item):
+    lost = make_item(ItemType.LOST, "wallet", "black leather wallet", (20, 20, 20))
+    for i in range(12):
+        make_item(ItemType.FOUND, "wallet", f"wallet number {i}", (20 + 10 * i, 20, 20))
+
+    result = run_matching(db, lost, top_k=5)
+
+    assert result["status"] == "success"
+    db.expire_all()
+    assert db.query(Match).filter(Match.lost_item_id == lost.id).count() > 0
+    assert db.get(SearchWatermark, lost.id) is not None
+    for kind in ("dino", "text"):
+        assert db.query(ItemFeature).filter(ItemFeature.kind == kind).count() == 13
+
+
+def test_repeat_search_scores_only_candidates_added_since(db, fake_models, make_item):
+    lost = make_item(ItemType.LOST)
+    for _ in range(3):
+        make_item(ItemType.FOUND)
+    run_matching(db, lost)
+
+    # Nothing new: no candidate passes the watermark, however timestamps compare
+    assert run_matching(db, lost)["new_candidates_checked"] == 0
+
+    make_item(ItemType.FOUND)
+    result = run_matching(db, lost)
+    assert result["source"] == "incremental"
+    assert result["new_candidates_checked"] == 1
+
+
+def test_unembeddable_items_do_not_resync_every_search(db, fake_models, make_item, tmp_path, monkeypatch):
+    for _ in range(3):
+        make_item(ItemType.FOUND)
+    broken = make_item(ItemType.FOUND)
+    (tmp_path / "static" / broken.image_path).unlink()
+
+    index = sync_vector_index(db, ItemType.FOUND, "dino")
+    assert len(index) == 3 and index.skipped == {broken.id}
+
+    loads, saves = [], []
+    monkeypatch.setattr(matching_service, "load_clean_image", lambda path: loads.append(path))
+    monkeypatch.setattr(index, "save", lambda: saves.append(True))
+    sync_vector_index(db, ItemType.FOUND, "dino")
+    assert loads == [] and saves == []
+
+    # Once the broken item is gone from the DB it leaves the skip list too
+    db.delete(broken)
+    db.commit()
+    sync_vector_index(db, ItemType.FOUND, "dino")
+    assert index.skipped == set() and saves == []
@@ -0,0 +1,22 @@
+import numpy as np
+
+from app.services.image_cache import image_cache
+from app.services.inference_executor import inference_executor
+from app.services.metrics import metrics
+
+
+def sample(name: str) -> float:
+    prefix = name + " "
+    return float(next(line for line in metrics.render().splitlines() if line.startswith(prefix))[len(prefix):])
+
+
+def test_metrics_expose_cache_and_executor_state():
+    image_cache.clear()
+    hits = sample('lostfound_cache_hits_total{cache="images"}')
+    image_cache.put(("a.jpg", 1), np.zeros(16, dtype=np.uint8))
+    image_cache.get(("a.jpg", 1))
+
+    assert sample('lostfound_cache_entries{cache="images"}') == 1
+    assert sample('lostfound_cache_hits_total{cache="images"}') == hits + 1
+    assert "# TYPE lostfound_cache_misses_total counter" in metrics.render()
+    assert sample(f'lostfound_inference_max_workers{{mode="{inference_executor.mode}"}}') == inference_executor.max_workers
@@ -0,0 +1,28 @@
+import asyncio
+
+from app.api.routes.search import get_recent_matches
+from app.models.database_models import ItemType, Match
+
+
+def test_recent_matches_pages_through_every_match(db, make_item):
+    lost = make_item(ItemType.LOST)
+    found = [make_item(ItemType.FOUND) for _ in range(5)]
+    # Same-second server timestamps: the page boundary must not depend on them
+    db.add_all(
+        Match(lost_item_id=lost.id, found_item_id=item.id, is_match=1, confidence=90.0, model_version="test")
+        for item in found
+    )
+    db.commit()
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = asyncio.run(get_recent_matches(limit=2, cursor=cursor, db=db))
+        seen.extend(match["match_id"] for match in page["recent_matches"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None or pages > 5:
+            break
+
+    assert pages == 3
+    assert len(seen) == 5 and len(set(seen)) == 5
+    assert seen == sorted(seen, reverse=True)
@@ -0,0 +1,20 @@
+import numpy as np
+
+from app.services.vector_index import VectorIndex
+
+
+def test_remove_defers_the_quantizer_save_when_asked(tmp_path):
+    index = VectorIndex(tmp_path, "dino_found", brute_force_max=4, nlist=2)
+    rng = np.random.default_rng(0)
+    assert index.add_many(list(range(6)), rng.normal(size=(6, 8)), save=False)
+    assert not index.path.exists()
+
+    # Back to brute-force size: the quantizer is dropped but not written
+    assert not index.remove(0, save=False)
+    assert index.remove(1, save=False)
+    assert index.centroids is None and not index.path.exists()
+    assert not index.remove(1, save=False)  # already gone
+
+    index.save()
+    assert index.path.exists()
+    assert {item_id for item_id, _ in index.search(rng.normal(size=8), 10)} == {2, 3, 4, 5}